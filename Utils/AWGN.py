@@ -0,0 +1,104 @@
+import numpy as np
+from Utils.BitBuffer import BitBuffer
+from Utils.HelperFunctions import get_rng, iter_buffer_bits
+
+# Bits carried by one symbol of each modulation (QPSK is Gray mapped: first bit on I, second on Q)
+MODULATIONS = {'bpsk': 1, 'qpsk': 2}
+
+
+def noise_sigma(ebn0_db, rate=1.0, modulation='bpsk'):
+    """
+    Standard deviation of the noise per real dimension for unit symbol energy.
+
+    ebn0_db: Eb/N0 per information bit in dB
+    rate: code rate, information bits per transmitted bit
+    modulation: 'bpsk' or 'qpsk'
+
+    Returns sigma, with sigma^2 = N0 / 2.
+    """
+    if modulation not in MODULATIONS:
+        raise ValueError(f"Unknown modulation {modulation!r}, expected one of {list(MODULATIONS)}.")
+    if not 0 < rate <= 1:
+        raise ValueError("The code rate must be in (0, 1].")
+    esn0 = 10 ** (ebn0_db / 10) * rate * MODULATIONS[modulation]
+    return np.sqrt(1 / (2 * esn0))
+
+
+def bpsk_modulate(bits):
+    """Map bits to BPSK symbols (0 -> -1, 1 -> +1) as float32."""
+    return 2 * np.asarray(bits, dtype=np.float32) - 1
+
+
+def qpsk_modulate(bits):
+    """Map bit pairs to unit-energy Gray QPSK symbols as complex64; an odd last bit is padded with a 0."""
+    bits = np.asarray(bits, dtype=np.uint8).ravel()
+    if bits.size % 2:
+        bits = np.append(bits, np.uint8(0))
+    return (bpsk_modulate(bits) / np.float32(np.sqrt(2))).view(np.complex64)
+
+
+def _scaled_normal(rng, out, scale):
+    """
+    Fill a float32 array with normal samples of standard deviation scale (Box-Muller transform).
+
+    numpy's own float32 normal generator is the bottleneck of the channel; Box-Muller needs one uniform per
+    sample and only float32 transcendental functions. The radius uniforms are drawn in float64 so that the
+    tails are resolved up to about 8.5 sigma.
+    """
+    half = (out.size + 1) // 2
+    uniform = rng.random(half)
+    radius = np.subtract(1, uniform, out=uniform).astype(np.float32)  # in (0, 1], so the log is finite
+    np.log(radius, out=radius)
+    radius *= np.float32(-2 * scale * scale)
+    np.sqrt(radius, out=radius)
+    angle = rng.random(half, dtype=np.float32)
+    angle *= np.float32(2 * np.pi)
+    cosine, sine = out[:half], out[half:]
+    np.cos(angle, out=cosine)
+    cosine *= radius
+    np.sin(angle[:sine.size], out=sine)
+    sine *= radius[:sine.size]
+
+
+def awgn_llr(bits, ebn0_db, rate=1.0, modulation='bpsk', rng=None, chunk_bits=1 << 16):
+    """
+    Send bits through an AWGN channel and return the log-likelihood ratio of every received bit.
+
+    The I and Q components of a QPSK symbol carry one bit each and see independent noise, so both
+    modulations are simulated on real-valued amplitudes, chunk_bits bits at a time.
+
+    bits: flat array of bits or a packed BitBuffer
+    ebn0_db: Eb/N0 per information bit in dB
+    rate: code rate of the transmitted bits, used to convert Eb/N0 to the symbol SNR
+    modulation: 'bpsk' or 'qpsk'
+    rng: seed or numpy Generator used for the noise
+    chunk_bits: number of bits modulated and disturbed at once
+
+    Returns a float32 array of LLRs, log P(1) / P(0), one per bit ('soft' input of the Viterbi decoder).
+    """
+    rng = get_rng(rng)
+    sigma = noise_sigma(ebn0_db, rate, modulation)
+    amplitude = 1 / np.sqrt(MODULATIONS[modulation])
+    # LLR of a received amplitude y = amplitude * (2b - 1) + sigma * noise is 2 * amplitude * y / sigma^2
+    signal = np.array([-1, 1], dtype=np.float32) * np.float32(2 * amplitude ** 2 / sigma ** 2)
+    noise_scale = 2 * amplitude / sigma
+
+    if isinstance(bits, BitBuffer):
+        total, chunks = len(bits), iter_buffer_bits(bits, chunk_bits)
+    else:
+        bits = np.asarray(bits, dtype=np.uint8).ravel()
+        total, chunks = bits.size, (bits[start:start + chunk_bits] for start in range(0, bits.size, chunk_bits))
+
+    llrs = np.empty(total, dtype=np.float32)
+    position = 0
+    for chunk in chunks:
+        out = llrs[position:position + chunk.size]
+        _scaled_normal(rng, out, noise_scale)
+        out += signal[chunk]
+        position += chunk.size
+    return llrs
+
+
+def hard_decisions(llrs):
+    """Hard decisions (uint8 bits) of LLRs, for decoders that only take bits."""
+    return (np.asarray(llrs) > 0).astype(np.uint8)
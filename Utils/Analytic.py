@@ -0,0 +1,266 @@
+"""
+Closed-form and semi-analytic estimates of the decoded BER/FER, returned instantly instead of simulated.
+
+- Hamming(7, 4) over BSC (and over AWGN, whose hard decisions form a BSC) and over Gilbert-Elliott: exact, from
+  the decoder's outcome for all 128 error patterns and, for Gilbert-Elliott, a Markov chain over the channel state.
+- Convolutional codes over BSC (hard decisions) and AWGN (soft decisions): union bounds from the distance
+  spectrum of the trellis. They are upper bounds, tight only at low error rates and for a traceback deep enough
+  for maximum-likelihood decoding; every estimate says whether simulation is still required.
+- Convolutional codes over Gilbert-Elliott have no closed form here and always need simulation.
+"""
+import math
+
+import numpy as np
+
+from Utils.Convolutional import ConvolutionalCoder
+from Utils.Hamming import Hamming
+
+# A union bound above this BER is considered loose
+UNION_BOUND_LIMIT = 1e-3
+# Largest output weight of the distance spectrum used for the union bounds
+MAX_DISTANCE = 40
+# Traceback needed for (near) maximum-likelihood Viterbi decisions, in constraint lengths
+TRACEBACK_CONSTRAINT_LENGTHS = 5
+
+# Distance spectra computed so far, keyed by (memory, generators, max_distance)
+_SPECTRA = {}
+
+
+def q_function(x):
+    """Tail probability of the standard normal distribution."""
+    return 0.5 * math.erfc(x / math.sqrt(2))
+
+
+def bsc_crossover(ebn0_db, rate):
+    """Bit error rate of hard BPSK decisions at the given Eb/N0 (dB) of the information bits and code rate."""
+    return q_function(math.sqrt(2 * rate * 10 ** (ebn0_db / 10)))
+
+
+def ge_transition_matrix(chance_for_bad, chance_for_good):
+    """(2, 2) state transition matrix of the Gilbert-Elliott channel (0 - good, 1 - bad)."""
+    return np.array([[1 - chance_for_bad, chance_for_bad], [chance_for_good, 1 - chance_for_good]])
+
+
+def ge_stationary(chance_for_bad, chance_for_good):
+    """Stationary state distribution; a chain that never moves stays in the good state it starts in."""
+    if chance_for_bad + chance_for_good <= 0:
+        return np.array([1.0, 0.0])
+    bad = chance_for_bad / (chance_for_bad + chance_for_good)
+    return np.array([1 - bad, bad])
+
+
+def ge_error_count_distribution(nbits, chance_for_bad, chance_for_good, p_err_good, p_err_bad):
+    """
+        Distribution of the number of errors in a block of nbits bits of a Gilbert-Elliott channel in its
+        stationary state, by a forward recursion over (number of errors, state).
+
+        The state is updated before every bit, as in GilbertElliottChannel.
+
+        :return: float array of length nbits + 1, entry k being the probability of exactly k errors.
+    """
+    transition = ge_transition_matrix(chance_for_bad, chance_for_good)
+    p_err = np.array([p_err_good, p_err_bad])
+    # forward[k, s]: probability of k errors so far and the channel in state s
+    forward = np.zeros((nbits + 1, 2))
+    forward[0] = ge_stationary(chance_for_bad, chance_for_good)
+    for bit in range(nbits):
+        forward = forward @ transition
+        forward[1:bit + 2] = forward[1:bit + 2] * (1 - p_err) + forward[:bit + 1] * p_err
+        forward[0] *= 1 - p_err
+    return forward.sum(axis=1)
+
+
+def ge_block_error_probability(nbits, correctable, chance_for_bad, chance_for_good, p_err_good, p_err_bad):
+    """
+        Probability that a block of nbits bits of a Gilbert-Elliott channel has more than `correctable` errors,
+        i.e. the block error probability of a bounded-distance decoder correcting that many bit errors.
+    """
+    distribution = ge_error_count_distribution(nbits, chance_for_bad, chance_for_good, p_err_good, p_err_bad)
+    return max(0.0, 1.0 - float(distribution[:correctable + 1].sum()))
+
+
+def _hamming_data_errors():
+    """Number of wrong data bits after decoding, for every 7-bit error pattern (p1 most significant)."""
+    # The code is linear and the decoder only looks at the syndrome, so the all-zero codeword can be assumed
+    return np.unpackbits(Hamming.DECODE_TABLE.astype(np.uint8)).reshape(-1, 8).sum(axis=1)
+
+
+def _hamming_pattern_matrices(p_err, transition):
+    """
+        Probabilities of every 7-bit error pattern given the state before the codeword, ending in every state.
+
+        :return: (128, S, S) array; entry [e, s, s'] is P(pattern e, final state s' | state s before the first bit).
+    """
+    states = transition.shape[0]
+    patterns = np.unpackbits(np.arange(128, dtype=np.uint8)[:, None], axis=1)[:, 1:]
+    matrices = np.broadcast_to(np.eye(states), (128, states, states)).copy()
+    for position in range(7):
+        emission = np.where(patterns[:, position, None] == 1, p_err, 1 - p_err)
+        matrices = (matrices @ transition) * emission[:, None, :]
+    return matrices
+
+
+def hamming_estimate(p_err, frame_bits, transition=None, initial=None):
+    """
+        Exact decoded BER/FER of Hamming(7, 4) with syndrome decoding.
+
+        :param p_err: Crossover probability of the BSC, or the error probability of every channel state.
+        :param frame_bits: Message bits per frame (a multiple of 4).
+        :param transition: State transition matrix of a Markov channel (default: a memoryless BSC).
+        :param initial: State distribution before the frame (default: the only state).
+        :return: A tuple (ber, fer, codeword error probability).
+    """
+    if transition is None:
+        transition, initial = np.ones((1, 1)), np.ones(1)
+    matrices = _hamming_pattern_matrices(np.atleast_1d(np.asarray(p_err, dtype=float)), transition)
+    data_errors = _hamming_data_errors()
+    # Over one codeword, and per codeword of a frame through the chain of its final states
+    pattern_probability = np.einsum('s,est->e', initial, matrices)
+    ber = float(pattern_probability @ data_errors) / 4
+    correct = matrices[data_errors == 0].sum(axis=0)
+    codeword_error = 1.0 - float(initial @ correct.sum(axis=1))
+    frame_correct = initial @ np.linalg.matrix_power(correct, frame_bits // 4)
+    return ber, max(0.0, 1.0 - float(frame_correct.sum())), max(0.0, codeword_error)
+
+
+def distance_spectrum(code, max_distance=MAX_DISTANCE):
+    """
+        Distance spectrum of a rate 1/n convolutional code: the error events (paths leaving the all-zero state
+        and returning to it for the first time) by output weight, enumerated over the trellis.
+
+        :param code: A ConvolutionalCode (or trellis with next_state_table, output_table, n).
+        :param max_distance: Largest output weight counted.
+        :return: A tuple (events, input_weights) of float arrays indexed by output weight 0..max_distance:
+                 the number of error events of that weight and the sum of their input weights.
+        :raises ValueError: If the code is catastrophic (an infinite path of finite weight).
+    """
+    key = (code.total_memory, tuple(getattr(code, 'generators', ())), max_distance)
+    if key in _SPECTRA:
+        return _SPECTRA[key]
+    next_states = np.asarray(code.next_state_table)
+    weights = np.vectorize(lambda output: bin(int(output)).count('1'))(np.asarray(code.output_table))
+    number_states = next_states.shape[0]
+    events = np.zeros(max_distance + 1)
+    input_weights = np.zeros(max_distance + 1)
+    # Paths that have left state 0 and not come back yet: counts[s, d] paths in state s with output weight d,
+    # inputs[s, d] the sum of their input weights
+    counts = np.zeros((number_states, max_distance + 1))
+    inputs = np.zeros((number_states, max_distance + 1))
+    if weights[0, 1] <= max_distance:
+        counts[next_states[0, 1], weights[0, 1]] = 1
+        inputs[next_states[0, 1], weights[0, 1]] = 1
+    # Without zero-weight cycles every path gains weight at least once per number_states steps
+    for _ in range(number_states * (max_distance + 1) + 1):
+        if not counts.any():
+            break
+        next_counts = np.zeros_like(counts)
+        next_inputs = np.zeros_like(inputs)
+        for state in np.flatnonzero(counts.any(axis=1)):
+            for bit in (0, 1):
+                target, weight = next_states[state, bit], weights[state, bit]
+                next_counts[target, weight:] += counts[state, :max_distance + 1 - weight]
+                next_inputs[target, weight:] += (inputs[state] + bit * counts[state])[:max_distance + 1 - weight]
+        # Paths back in state 0 are complete error events
+        events += next_counts[0]
+        input_weights += next_inputs[0]
+        next_counts[0] = 0
+        next_inputs[0] = 0
+        counts, inputs = next_counts, next_inputs
+    else:
+        raise ValueError("The code is catastrophic, its distance spectrum is unbounded.")
+    _SPECTRA[key] = (events, input_weights)
+    return events, input_weights
+
+
+def pairwise_error_bsc(distance, p):
+    """Probability that hard-decision decoding prefers a path at Hamming distance `distance` on a BSC(p)."""
+    probability = sum(math.comb(distance, k) * p ** k * (1 - p) ** (distance - k)
+                      for k in range(distance // 2 + 1, distance + 1))
+    if distance % 2 == 0:
+        # Ties are broken at random
+        probability += 0.5 * math.comb(distance, distance // 2) * (p * (1 - p)) ** (distance // 2)
+    return probability
+
+
+def pairwise_error_awgn(distance, ebn0_db, rate):
+    """Probability that soft-decision decoding of BPSK prefers a path at Hamming distance `distance`."""
+    return q_function(math.sqrt(2 * distance * rate * 10 ** (ebn0_db / 10)))
+
+
+def union_bound(code, pairwise_error, frame_bits, max_distance=MAX_DISTANCE):
+    """
+        Union bounds of the decoded BER and FER of a convolutional code under maximum-likelihood decoding.
+
+        :param code: A ConvolutionalCode.
+        :param pairwise_error: Function of the output distance d giving the pairwise error probability P_d.
+        :param frame_bits: Message bits per frame.
+        :param max_distance: Largest output weight of the spectrum.
+        :return: A tuple (ber, fer, converged); converged is False when the last terms of the series are not
+                 negligible, so the truncated bound may be too low.
+    """
+    events, input_weights = distance_spectrum(code, max_distance)
+    distances = np.flatnonzero(events)
+    probabilities = np.array([pairwise_error(int(distance)) for distance in distances])
+    bit_terms = input_weights[distances] * probabilities
+    ber = float(bit_terms.sum())
+    event_probability = float(events[distances] @ probabilities)
+    converged = ber == 0 or bit_terms[-3:].sum() <= 1e-2 * ber
+    return min(ber, 0.5), min(frame_bits * event_probability, 1.0), converged
+
+
+def estimate(coder, channel, params, frame_bits=1024, tb_depth=10):
+    """
+        Expected decoded BER/FER of a Sweep configuration, without simulation where a closed form exists.
+
+        :param coder: 'hamming' or 'convolutional' (ConvolutionalCoder.trellis).
+        :param channel: 'bsc', 'gilbert_elliott' or 'awgn'.
+        :param params: Channel parameters, as in a Sweep grid point.
+        :param frame_bits: Message bits per frame.
+        :param tb_depth: Traceback depth of the Viterbi decoder.
+        :return: A dictionary:
+                - decoded_ber, decoded_fer: The estimates (None when there is none).
+                - method: 'exact', 'union_bound' or None.
+                - simulate: True where the estimate is missing or loose, so simulation is still required.
+                - reason: Why simulation is required (None otherwise).
+        :raises ValueError: If the coder or channel is unknown.
+    """
+    def result(ber, fer, method, reason=None):
+        return {'decoded_ber': ber, 'decoded_fer': fer, 'method': method, 'simulate': reason is not None,
+                'reason': reason}
+
+    if channel not in ('bsc', 'gilbert_elliott', 'awgn'):
+        raise ValueError(f"Unknown channel {channel!r}.")
+    if coder == 'hamming':
+        if channel == 'gilbert_elliott':
+            chance_for_bad, chance_for_good = params['chance_for_bad'], params['chance_for_good']
+            ber, fer, _ = hamming_estimate((params['p_err_good'], params['p_err_bad']), frame_bits,
+                                           ge_transition_matrix(chance_for_bad, chance_for_good),
+                                           ge_stationary(chance_for_bad, chance_for_good))
+        else:
+            p = params['ber'] if channel == 'bsc' else bsc_crossover(params['ebn0_db'], 4 / 7)
+            ber, fer, _ = hamming_estimate(p, frame_bits)
+        return result(ber, fer, 'exact')
+    if coder != 'convolutional':
+        raise ValueError(f"Unknown coder {coder!r}.")
+
+    code = ConvolutionalCoder.trellis
+    if channel == 'gilbert_elliott':
+        return result(None, None, None, "no closed form for Viterbi decoding over a channel with memory")
+    if getattr(code, 'puncture', None) is not None:
+        return result(None, None, None, "the union bound is not computed for punctured codes")
+    if channel == 'bsc':
+        ber, fer, converged = union_bound(code, lambda d: pairwise_error_bsc(d, params['ber']), frame_bits)
+    else:
+        # The terminating tail lowers the rate the Eb/N0 is given for, as in the simulation
+        rate = frame_bits / (code.n * (frame_bits + code.total_memory))
+        ber, fer, converged = union_bound(code, lambda d: pairwise_error_awgn(d, params['ebn0_db'], rate),
+                                          frame_bits)
+    if tb_depth - 2 < TRACEBACK_CONSTRAINT_LENGTHS * (code.total_memory + 1):
+        reason = "the traceback is too short for maximum-likelihood decisions"
+    elif not converged:
+        reason = "the union bound series has not converged"
+    elif ber > UNION_BOUND_LIMIT:
+        reason = "the union bound is loose at this error rate"
+    else:
+        reason = None
+    return result(ber, fer, 'union_bound', reason)
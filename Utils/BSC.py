@@ -1,60 +1,150 @@
-import random
+import numpy as np
+from Utils.BitBuffer import BitBuffer
+from Utils.HelperFunctions import get_rng
 
-def bsc_channel_transmission_hamming(bit_list, ber):
+# Below this BER the error positions are drawn directly instead of testing every bit
+SPARSE_BER_THRESHOLD = 0.05
+
+
+def bsc_error_mask(nbits, ber, rng=None):
+    """
+    Draw the error mask of a BSC channel for nbits transmitted bits in one vectorized call.
+
+    nbits: number of transmitted bits
+    ber: bit error rate (BER)
+    rng: seed or numpy Generator used for the draw
+
+    Returns a flat uint8 array of length nbits (1 indicates error, 0 no error).
+    """
+    rng = get_rng(rng)
+    mask = np.zeros(nbits, dtype=np.uint8)
+    if nbits == 0 or ber <= 0:
+        return mask
+    if ber < SPARSE_BER_THRESHOLD:
+        # Number of errors is binomial, their positions are uniform without repetition
+        error_count = rng.binomial(nbits, ber)
+        mask[rng.choice(nbits, error_count, replace=False)] = 1
+    else:
+        mask[:] = rng.random(nbits) < ber
+    return mask
+
+
+def bsc_error_buffer(nbits, ber, rng=None, chunk_bits=1 << 20):
+    """
+    Draw the error mask of a BSC channel directly as a packed BitBuffer, never expanding it to one byte per bit.
+
+    nbits: number of transmitted bits
+    ber: bit error rate (BER)
+    rng: seed or numpy Generator used for the draw
+    chunk_bits: number of bits drawn at once when errors are dense
+
+    Returns a BitBuffer of nbits bits (1 indicates error, 0 no error).
+    """
+    rng = get_rng(rng)
+    mask = BitBuffer.zeros(nbits)
+    if nbits == 0 or ber <= 0:
+        return mask
+    if ber < SPARSE_BER_THRESHOLD:
+        positions = rng.choice(nbits, rng.binomial(nbits, ber), replace=False)
+        np.bitwise_or.at(mask.data, positions >> 3, (0x80 >> (positions & 7)).astype(np.uint8))
+    else:
+        for start in range(0, nbits, chunk_bits):
+            packed = np.packbits(rng.random(min(chunk_bits, nbits - start)) < ber)
+            mask.data[start // 8:start // 8 + packed.size] = packed
+    return mask
+
+
+def bsc_transmit(bits, ber, rng=None, packed=False):
+    """
+    Simulate transmission of a whole bit array through a BSC channel.
+
+    bits: uint8 array of bits (any shape), of packed bytes when packed=True, or a BitBuffer
+    ber: bit error rate (BER)
+    rng: seed or numpy Generator used for the draw
+    packed: if True every byte of bits carries 8 transmitted bits (np.packbits layout)
+
+    Returns the received array and the error mask, both with the shape and layout of bits
+    (BitBuffers for a BitBuffer, the mask being XORed word-wise).
+    """
+    if isinstance(bits, BitBuffer):
+        errors = bsc_error_buffer(len(bits), ber, rng)
+        return bits ^ errors, errors
+    bits = np.asarray(bits, dtype=np.uint8)
+    if packed:
+        errors = np.packbits(bsc_error_mask(bits.size * 8, ber, rng)).reshape(bits.shape)
+    else:
+        errors = bsc_error_mask(bits.size, ber, rng).reshape(bits.shape)
+    return bits ^ errors, errors
+
+
+def bsc_log_likelihood_ratio(errors, ber, biased_ber):
+    """
+    Log-likelihood ratio of error masks under the nominal and the biased BSC, log P(errors) / Q(errors).
+
+    errors: uint8 error mask, flat (one ratio) or (F, L) (one ratio per row)
+    ber: nominal bit error rate
+    biased_ber: bit error rate the mask was drawn with
+
+    Returns a float64 array with one log ratio per row (a 0-d array for a flat mask).
+    """
+    errors = np.asarray(errors)
+    flips = np.count_nonzero(errors, axis=-1)
+    with np.errstate(divide='ignore'):
+        flip_ratio = np.log(ber) - np.log(biased_ber)
+        keep_ratio = np.log1p(-ber) - np.log1p(-biased_ber)
+    # 0 * log(0) terms are patterns that cannot occur, they contribute nothing
+    return np.where(flips > 0, flips * flip_ratio, 0.0) + np.where(errors.shape[-1] > flips,
+                                                                   (errors.shape[-1] - flips) * keep_ratio, 0.0)
+
+
+def bsc_transmit_biased(bits, ber, biased_ber, rng=None):
+    """
+    Importance-sampling transmission through a BSC: errors are drawn with biased_ber (usually much larger than
+    ber), and every frame gets the likelihood ratio that makes weighted error counts unbiased estimates for ber.
+
+    bits: uint8 array of bits, flat (one frame) or (F, L) (F frames)
+    ber: nominal bit error rate
+    biased_ber: bit error rate the errors are drawn with
+    rng: seed or numpy Generator used for the draw
+
+    Returns the received array, the error mask and the log-likelihood ratio of every frame.
+    """
+    if not 0 < biased_ber < 1:
+        raise ValueError("The biased bit error rate must be in (0, 1).")
+    received, errors = bsc_transmit(bits, biased_ber, rng)
+    return received, errors, bsc_log_likelihood_ratio(errors, ber, biased_ber)
+
+
+def bsc_channel_transmission_hamming(bit_list, ber, rng=None):
     """
     Simulate transmission through a BSC channel for each sublist of bits in the list.
 
     bit_list: list where each element is a list of bits (e.g., [1, 0, 1])
     ber: bit error rate (BER)
+    rng: seed or numpy Generator used for the draw
 
     Returns the list of received bits and the list of errors.
     """
-    received_list = []
-    error_list = []
-    total_bits = 0
-    error_count = 0  # Track total errors for analysis
-
-    for bits in bit_list:
-        received_bits = []
-        error_bits = []
-        for bit in bits:
-            error = random.random() < ber  # Random error for each bit
-            error_count += error  # Count each error for tracking
-            total_bits += 1
-            received_bit = (bit + int(error)) % 2  # Ensure type consistency
-            received_bits.append(int(received_bit))  # Convert to int
-            error_bits.append(int(error))  # 1 indicates error, 0 no error
+    received, errors = bsc_transmit(bit_list, ber, rng)
 
-        received_list.append(received_bits)
-        error_list.append(error_bits)
+    print(f"Actual BER observed: {errors.mean():.3f}")  # Compare to target BER
 
-    print(f"Actual BER observed: {error_count / total_bits:.3f}")  # Compare to target BER
+    return received.tolist(), errors.tolist()
 
-    return received_list, error_list
 
-
-def bsc_channel_transmission_splot(bit_list, ber):
+def bsc_channel_transmission_splot(bit_list, ber, rng=None):
     """
     Simulate transmission through a BSC channel for each bit in the list.
 
     bit_list: list of bits (e.g., [1, 0, 1])
     ber: bit error rate (BER)
+    rng: seed or numpy Generator used for the draw
 
     Returns the list of received bits and the list of errors.
     """
-    received_list = []
-    error_list = []
-    total_bits = len(bit_list)  # Total number of bits transmitted
-    error_count = 0  # Track total errors for analysis
-
-    for bit in bit_list:
-        error = random.random() < ber  # Random error for each bit
-        error_count += error  # Count each error for tracking
-        received_bit = (bit + int(error)) % 2  # Ensure type consistency with int(error)
-        received_list.append(int(received_bit))  # Convert to int
-        error_list.append(int(error))  # 1 indicates error, 0 no error
+    received, errors = bsc_transmit(bit_list, ber, rng)
 
     # Print the observed BER
-    print(f"Actual BER observed: {error_count / total_bits:.3f}")  # Compare to target BER
+    print(f"Actual BER observed: {errors.mean():.3f}")  # Compare to target BER
 
-    return received_list, error_list
\ No newline at end of file
+    return received.tolist(), errors.tolist()
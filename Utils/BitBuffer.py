@@ -0,0 +1,127 @@
+import numpy as np
+
+# Storage is padded to whole 64-bit words so that it can always be viewed as uint64
+WORD_BYTES = 8
+
+
+class BitBuffer:
+    def __init__(self, data, nbits):
+        """
+            A sequence of bits packed 8 per byte (most significant bit first, the np.packbits layout).
+
+            The bytes are kept in a uint8 array padded with zero bytes to a multiple of 8, so the same memory
+            can be viewed as uint64 words and bitwise operations run a whole word at a time. Bits past nbits
+            are always 0.
+
+            :param data: uint8 array of packed bits, its size must be a multiple of 8 bytes (it is not copied).
+            :param nbits: Number of valid bits.
+            :raises ValueError: If the storage is not word-aligned or too small for nbits.
+        """
+        data = np.asarray(data)
+        if data.dtype != np.uint8 or data.ndim != 1 or data.size % WORD_BYTES != 0:
+            raise ValueError("Data must be a flat uint8 array padded to a multiple of 8 bytes.")
+        if not 0 <= nbits <= data.size * 8:
+            raise ValueError("Number of bits does not fit in the data.")
+        self.data = data
+        self.nbits = int(nbits)
+
+    @staticmethod
+    def storage_bytes(nbits):
+        """Number of storage bytes of a buffer with nbits bits."""
+        return -(-nbits // (8 * WORD_BYTES)) * WORD_BYTES
+
+    @classmethod
+    def zeros(cls, nbits):
+        """A buffer of nbits zero bits."""
+        return cls(np.zeros(cls.storage_bytes(nbits), dtype=np.uint8), nbits)
+
+    @classmethod
+    def from_bytes(cls, data, nbits=None):
+        """
+            A buffer holding the bits of a bytes-like object or uint8 array (8 bits per byte).
+            :param data: Bytes, or a uint8 array of any shape.
+            :param nbits: Number of bits to keep (default: all of them).
+            :return: A new BitBuffer.
+        """
+        data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray, memoryview)) \
+            else np.ascontiguousarray(data, dtype=np.uint8).ravel()
+        nbits = data.size * 8 if nbits is None else nbits
+        buffer = cls.zeros(nbits)
+        nbytes = -(-nbits // 8)
+        buffer.data[:nbytes] = data[:nbytes]
+        buffer.clear_tail()
+        return buffer
+
+    @classmethod
+    def from_bits(cls, bits):
+        """A buffer holding an array (or list) of 0/1 values, one bit per element."""
+        bits = np.asarray(bits, dtype=np.uint8).ravel()
+        buffer = cls.zeros(bits.size)
+        packed = np.packbits(bits)
+        buffer.data[:packed.size] = packed
+        return buffer
+
+    def __len__(self):
+        return self.nbits
+
+    def __repr__(self):
+        return f"BitBuffer(nbits={self.nbits})"
+
+    def __eq__(self, other):
+        return isinstance(other, BitBuffer) and self.nbits == other.nbits \
+            and np.array_equal(self.data[:self.nbytes], other.data[:other.nbytes])
+
+    @property
+    def nbytes(self):
+        """Number of bytes holding valid bits."""
+        return -(-self.nbits // 8)
+
+    @property
+    def words(self):
+        """Zero-copy uint64 view of the storage."""
+        return self.data.view(np.uint64)
+
+    def clear_tail(self):
+        """Zero the padding bits past nbits."""
+        if self.nbits % 8:
+            self.data[self.nbits // 8] &= np.uint8(0xFF << (8 - self.nbits % 8) & 0xFF)
+        self.data[self.nbytes:] = 0
+
+    def bits(self, start=0, stop=None):
+        """
+            Unpack a range of bits.
+            :param start: Index of the first bit.
+            :param stop: Index after the last bit (default: the end of the buffer).
+            :return: A uint8 array with one bit per element.
+        """
+        stop = self.nbits if stop is None else min(stop, self.nbits)
+        first_byte = start // 8
+        unpacked = np.unpackbits(self.data[first_byte:-(-stop // 8)])
+        return unpacked[start - first_byte * 8:stop - first_byte * 8]
+
+    def count(self):
+        """Number of 1 bits."""
+        if hasattr(np, 'bitwise_count'):
+            return int(np.bitwise_count(self.words).sum(dtype=np.int64))
+        return int(np.unpackbits(self.data).sum(dtype=np.int64))
+
+    def __xor__(self, other):
+        if self.nbits != other.nbits:
+            raise ValueError("Buffers must have the same number of bits.")
+        return BitBuffer(np.bitwise_xor(self.words, other.words).view(np.uint8), self.nbits)
+
+    def __ixor__(self, other):
+        if self.nbits != other.nbits:
+            raise ValueError("Buffers must have the same number of bits.")
+        np.bitwise_xor(self.words, other.words, out=self.words)
+        return self
+
+    def __getstate__(self):
+        # Only the valid bytes are pickled when a buffer is sent to a worker process
+        return self.data[:self.nbytes].copy(), self.nbits
+
+    def __setstate__(self, state):
+        data, nbits = state
+        self.data = np.zeros(self.storage_bytes(nbits), dtype=np.uint8)
+        self.data[:data.size] = data
+        self.nbits = nbits
@@ -0,0 +1,154 @@
+import numpy as np
+
+from Utils.Viterbi import trellis_tables
+
+# Codes built so far, keyed by (memory, generators, puncture pattern)
+_REGISTRY = {}
+# How an encoded frame ends: flushed to state 0 by memory zero tail bits, simply cut off after the last data
+# bit, or started in the state it ends in (no tail bits, the last data bits preload the register)
+TERMINATIONS = ('terminated', 'truncated', 'tail-biting')
+
+
+class ConvolutionalCode:
+    def __init__(self, memory, generators, puncture=None):
+        """
+            A rate 1/n feed-forward convolutional code with its precomputed transition tables.
+
+            The object has the attributes of a commpy Trellis (k, n, total_memory, number_states,
+            next_state_table, output_table, code_type), so it can be passed wherever a trellis is expected,
+            and the tables are built exactly as commpy builds them: bit j of a generator taps the input
+            delayed by j steps. Use convolutional_code() to get the shared instance of a configuration.
+
+            :param memory: Number of delay elements (constraint length - 1).
+            :param generators: The n generator polynomials, as integers (e.g. (0o171, 0o133)).
+            :param puncture: Optional 0/1 pattern applied cyclically to the encoded bits, 1 keeps a bit; its length
+                             must be a multiple of n.
+            :raises ValueError: If the memory, generators or puncture pattern are invalid.
+        """
+        if memory < 1:
+            raise ValueError("Memory must be at least 1.")
+        if len(generators) < 1 or any(generator <= 0 or generator >= 1 << (memory + 1) for generator in generators):
+            raise ValueError(f"Generators must be non-zero polynomials of at most {memory + 1} bits.")
+        self.k = 1
+        self.n = len(generators)
+        self.total_memory = memory
+        self.number_states = 1 << memory
+        self.code_type = 'default'
+        self.generators = tuple(int(generator) for generator in generators)
+
+        registers = (np.arange(2)[None, :] << memory) | np.arange(self.number_states)[:, None]
+        self.next_state_table = registers >> 1
+        self.output_table = np.zeros((self.number_states, 2), dtype=int)
+        for generator in self.generators:
+            parity = np.zeros_like(registers)
+            for delay in range(memory + 1):
+                if generator >> delay & 1:
+                    parity ^= (registers >> (memory - delay)) & 1
+            self.output_table = (self.output_table << 1) | parity
+        self.tables = trellis_tables(self)
+
+        if puncture is not None:
+            puncture = np.asarray(puncture, dtype=np.uint8).ravel()
+            if puncture.size % self.n != 0 or not puncture.any() or np.any(puncture > 1):
+                raise ValueError("Puncture pattern must be a 0/1 pattern over whole steps (a multiple of n bits) "
+                                 "keeping at least one bit.")
+            if puncture.all():
+                puncture = None
+        self.puncture = puncture
+
+    @property
+    def rate(self):
+        """Number of data bits per transmitted bit."""
+        if self.puncture is None:
+            return 1 / self.n
+        return self.puncture.size / (self.n * int(self.puncture.sum()))
+
+    def __repr__(self):
+        generators = ', '.join(oct(generator) for generator in self.generators)
+        return f"ConvolutionalCode(memory={self.total_memory}, generators=({generators}), rate={self.rate:.3f})"
+
+    def encode(self, data_bits, termination='terminated'):
+        """
+            Encode a whole bit array at once, as the mod-2 convolution of the input with every generator.
+
+            :param data_bits: 1D array of data bits.
+            :param termination: One of TERMINATIONS; 'terminated' matches commpy's conv_encode.
+            :return: uint8 array of the (punctured) encoded bits, the outputs of a step first generator first.
+            :raises ValueError: If the termination is unknown.
+        """
+        data_bits = np.asarray(data_bits, dtype=np.uint8).ravel()
+        memory = self.total_memory
+        if termination == 'terminated':
+            padded = np.concatenate((np.zeros(memory, np.uint8), data_bits, np.zeros(memory, np.uint8)))
+        elif termination == 'truncated':
+            padded = np.concatenate((np.zeros(memory, np.uint8), data_bits))
+        elif termination == 'tail-biting':
+            initial = data_bits.take(np.arange(-memory, 0) % data_bits.size) if data_bits.size else data_bits
+            padded = np.concatenate((initial, data_bits))
+        else:
+            raise ValueError(f"Unknown termination {termination!r}, expected one of {list(TERMINATIONS)}.")
+
+        steps = padded.size - memory
+        encoded = np.zeros((steps, self.n), dtype=np.uint8)
+        for index, generator in enumerate(self.generators):
+            output = np.zeros(steps, dtype=np.uint8)
+            for delay in range(memory + 1):
+                if generator >> delay & 1:
+                    # Bit j of the generator taps the input delayed by j steps
+                    output ^= padded[memory - delay:memory - delay + steps]
+            encoded[:, index] = output
+        return self.puncture_bits(encoded.ravel())
+
+    def puncture_bits(self, coded_bits):
+        """Drop the encoded bits removed by the puncture pattern."""
+        coded_bits = np.asarray(coded_bits)
+        if self.puncture is None:
+            return coded_bits
+        return coded_bits[np.resize(self.puncture, coded_bits.size).astype(bool)]
+
+    def depuncture(self, received, decoding_type='hard'):
+        """
+            Put neutral values back where the puncture pattern removed encoded bits.
+
+            Hard bits cannot express an erasure, so they are mapped to BPSK values (0 -> -1, 1 -> +1) with 0
+            for the removed bits and must then be decoded as 'unquantized'; LLRs and BPSK values get 0.
+
+            :param received: 1D array of received bits, LLRs or real values, starting at the pattern's start.
+            :param decoding_type: 'hard', 'soft' or 'unquantized'.
+            :return: A tuple (values, decoding type to decode them with).
+        """
+        received = np.asarray(received)
+        if self.puncture is None:
+            return received, decoding_type
+        if decoding_type == 'hard':
+            received, decoding_type = 2.0 * received - 1, 'unquantized'
+        kept = int(self.puncture.sum())
+        periods = -(-received.size // kept)
+        positions = np.flatnonzero(np.tile(self.puncture, periods))[:received.size]
+        length = positions[-1] + 1 if received.size else 0
+        values = np.zeros(-(-length // self.n) * self.n, dtype=float)
+        values[positions] = received
+        return values, decoding_type
+
+
+def convolutional_code(generators, memory=None, constraint_length=None, puncture=None):
+    """
+        Get the shared ConvolutionalCode of a configuration, building its tables on first use.
+
+        :param generators: The n generator polynomials, as integers.
+        :param memory: Number of delay elements; alternatively give constraint_length (= memory + 1).
+        :param constraint_length: Constraint length K of the code.
+        :param puncture: Optional 0/1 puncture pattern over the encoded bits.
+        :return: The ConvolutionalCode, the same object for every call with the same configuration.
+        :raises ValueError: If neither or both of memory and constraint_length are given.
+    """
+    if (memory is None) == (constraint_length is None):
+        raise ValueError("Give exactly one of memory and constraint_length.")
+    if memory is None:
+        memory = constraint_length - 1
+    generators = tuple(int(generator) for generator in np.ravel(generators))
+    pattern = None if puncture is None else tuple(int(bit) for bit in np.ravel(puncture))
+    key = (int(memory), generators, pattern)
+    if key not in _REGISTRY:
+        _REGISTRY[key] = ConvolutionalCode(memory, generators, pattern)
+    return _REGISTRY[key]
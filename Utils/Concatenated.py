@@ -0,0 +1,69 @@
+import numpy as np
+from Utils.BitBuffer import BitBuffer
+from Utils.Convolutional import ConvolutionalCoder
+from Utils.HelperFunctions import buffer_bytes
+from Utils.Interleaver import Interleaver
+from Utils.ReedSolomon import ReedSolomon
+
+#reed-solomon (outer) + convolutional (inner)
+class ConcatenatedCoder:
+    # Codewords are written as rows and sent column by column, so consecutive bytes out of the inner decoder
+    # (whose residual errors come in bursts) belong to different RS codewords
+    INTERLEAVER = Interleaver('block', depth=ReedSolomon.N)
+
+    @staticmethod
+    def __inner_bytes(decodedBuffer):
+        """Bytes of the inner decoder output, without the bits decoded from the terminating tail."""
+        nbytes = (len(decodedBuffer) - ConvolutionalCoder.trellis.total_memory) // 8
+        return buffer_bytes(decodedBuffer)[:max(nbytes, 0)]
+
+    @staticmethod
+    def EncodePacked(dataBuffer):
+        """
+            RS(255, 223) encode the bytes of a packed bit buffer, interleave the codeword bytes and encode the
+            result with the convolutional code.
+            :param dataBuffer: BitBuffer of data bits (a whole number of bytes)
+            :return: BitBuffer of the encoded bits
+        """
+        codewords = ReedSolomon.Encode(buffer_bytes(dataBuffer))
+        return ConvolutionalCoder.EncodePacked(BitBuffer.from_bytes(ConcatenatedCoder.INTERLEAVER.interleave(codewords)))
+
+    @staticmethod
+    def DecodePacked(codeBuffer, tbDepth, returnCorrections=False):
+        """
+            Viterbi decode, de-interleave and RS decode a packed buffer of received bits.
+            :param codeBuffer: BitBuffer of received encoded bits
+            :param tbDepth: Tracking depth for the Viterbi decoder
+            :param returnCorrections: Also return the RS corrections and failure mask (see ReedSolomon.Decode)
+            :return: BitBuffer of the data bytes, with the corrections and failure mask if requested
+        """
+        received = ConcatenatedCoder.__inner_bytes(ConvolutionalCoder.DecodePacked(codeBuffer, tbDepth))
+        decoded = ReedSolomon.Decode(ConcatenatedCoder.INTERLEAVER.deinterleave(received), returnCorrections)
+        if returnCorrections:
+            return BitBuffer.from_bytes(decoded[0]), decoded[1], decoded[2]
+        return BitBuffer.from_bytes(decoded)
+
+    @staticmethod
+    def CodeData(word):
+        """
+            Encode a word (string of 8-bit characters).
+            :param word: The word to encode
+            :return: List of the encoded bits
+        """
+        data = np.array([ord(character) for character in word], dtype=np.uint8)
+        return ConcatenatedCoder.EncodePacked(BitBuffer.from_bytes(data)).bits().tolist()
+
+    @staticmethod
+    def Decode(codedBits, tbDepth, asWord):
+        """
+            Decode the received bits of an encoded word.
+            :param codedBits: Received bits (flat or nested list / array)
+            :param tbDepth: Tracking depth for the Viterbi decoder
+            :param asWord: Flag whether to return the result as word
+            :return: The decoded word, or the decoded data bits
+        """
+        codeBuffer = BitBuffer.from_bits(np.asarray(codedBits, dtype=np.uint8).ravel())
+        data = buffer_bytes(ConcatenatedCoder.DecodePacked(codeBuffer, tbDepth))
+        if asWord:
+            return ''.join(map(chr, data.tolist()))
+        return np.unpackbits(data).tolist()
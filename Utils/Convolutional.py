@@ -1,67 +1,117 @@
 import numpy as np
-from commpy.channelcoding.convcode import Trellis, conv_encode, viterbi_decode
-from Utils.HelperFunctions import word_to_list, decode_bits_to_string
+from Utils.BitBuffer import BitBuffer
+from Utils.CodeRegistry import convolutional_code
+from Utils.HelperFunctions import word_to_list, decode_bits_to_string, iter_buffer_bits, cached_class_property
+from Utils.Viterbi import viterbi_decode, viterbi_decode_batch, StreamingViterbiDecoder
 
 class ConvolutionalCoder:
-    K = 3  # Constraint length
-    code_rate = (1, K)  # Rate 1/K
+    # Default code: generators 5 and 7 (octal) on a memory-3 shift register, rate 1/2
     generators = np.array([[5, 7]])
-    trellis = Trellis(np.array([K]), generators)
 
-    @staticmethod
-    def __Encode(data_bits):
+    # Built on first use, so importing the coder (e.g. for a Hamming run) does not build any tables
+    @cached_class_property
+    def trellis(cls):
+        return convolutional_code((5, 7), memory=3)
+
+    @classmethod
+    def Create(cls, generators, memory=None, constraintLength=None, puncture=None):
+        """
+            Build a coder for another code; coders of the same configuration share its cached tables.
+            :param generators: Generator polynomials as integers, e.g. (0o171, 0o133)
+            :param memory: Number of delay elements (or give constraintLength = memory + 1)
+            :param constraintLength: Constraint length K of the code
+            :param puncture: Optional 0/1 puncture pattern over the encoded bits, e.g. (1, 1, 1, 0) for rate 2/3
+            :return: A ConvolutionalCoder class using the code
+        """
+        code = convolutional_code(generators, memory, constraintLength, puncture)
+        return type(f"ConvolutionalCoder_{code.total_memory}_{'_'.join(map(oct, code.generators))}", (cls,),
+                    {'generators': np.array([code.generators]), 'trellis': code})
+
+    @classmethod
+    def __Encode(cls, data_bits, termination):
         """
         Static method to encode spliced data.
         :param data_bits: Array of bits to be encoded (1D numpy array)
-        :return: Encoded array of bits
+        :param termination: 'terminated', 'truncated' or 'tail-biting'
+        :return: Encoded uint8 array of bits
         """
-        data_bits = np.array(data_bits).flatten()
-        encoded_bits = conv_encode(data_bits, ConvolutionalCoder.trellis)
-        print(len(encoded_bits.tolist()))
-        return encoded_bits.tolist()
+        return cls.trellis.encode(data_bits, termination)
 
-    @staticmethod
-    def __Decode(encoded_bits, tbDepth):
+    @classmethod
+    def __Decode(cls, encoded_bits, tbDepth, decodingType):
         """
-        Static method to decode encoded spliced data using the Viterbi algorithm.
+        Static method to decode encoded spliced data using the vectorized Viterbi algorithm.
         :param encoded_bits: Encoded bit array (1D numpy array)
         :param tbDepth: Traceback depth for Viterbi decoding
+        :param decodingType: 'hard' for bits, 'soft' for LLRs or 'unquantized' for real BPSK values
         :return: Decoded bit array
         """
-        encoded_bits_np = np.array(encoded_bits).flatten()
-        decoded_bits = viterbi_decode(encoded_bits_np, ConvolutionalCoder.trellis, tb_depth=tbDepth)
+        encoded_bits_np, decodingType = cls.trellis.depuncture(np.array(encoded_bits).flatten(), decodingType)
+        decoded_bits = viterbi_decode(encoded_bits_np, cls.trellis, tbDepth, decodingType)
         return decoded_bits.tolist()
 
-    @staticmethod
-    def CodeData(word, isPicture):
+    @classmethod
+    def CodeData(cls, word, isPicture, termination='terminated'):
         """
             A function that encodes an entire word (array of bits) using a splice encoder.
             :param word: An array of bits representing the word (e.g. the result of WordTable).
             :param isPicture: A boolean value which defines the input data type
-            :return: Encoded bit array
+            :param termination: 'terminated' (zero tail, what Decode expects), 'truncated' or 'tail-biting'
+            :return: Encoded uint8 bit array
         """
         if not isPicture:
             word = word_to_list(word)
-        encoded_bits = ConvolutionalCoder.__Encode(word)
+        encoded_bits = cls.__Encode(word, termination)
         return encoded_bits
 
-    @staticmethod
-    def Decode(codedWord, tbDepth, isAWord, isPicture):
+    @classmethod
+    def EncodePacked(cls, dataBuffer, termination='terminated'):
+        """
+            Encode a packed bit buffer, returning the encoded bits packed as well.
+            :param dataBuffer: BitBuffer of data bits
+            :param termination: 'terminated' (zero tail, what DecodePacked expects), 'truncated' or 'tail-biting'
+            :return: BitBuffer of encoded bits
+        """
+        return BitBuffer.from_bits(cls.trellis.encode(dataBuffer.bits(), termination))
+
+    @classmethod
+    def DecodePacked(cls, codeBuffer, tbDepth, chunkBits=1 << 16):
+        """
+            Hard-decision decode a packed buffer of encoded bits with the sliding-window Viterbi decoder,
+            unpacking only chunkBits bits at a time.
+            :param codeBuffer: BitBuffer of received encoded bits
+            :param tbDepth: Tracking depth for the Viterbi decoder
+            :param chunkBits: Number of encoded bits unpacked at once
+            :return: BitBuffer of decoded bits (one per encoded step, as Decode with isPicture)
+        """
+        code = cls.trellis
+        if code.puncture is None:
+            chunks = iter_buffer_bits(codeBuffer, chunkBits)
+            decoder = StreamingViterbiDecoder(code, tbDepth)
+        else:
+            # Chunks of whole puncture periods, so that every chunk starts at the beginning of the pattern
+            kept = int(code.puncture.sum())
+            chunks = (code.depuncture(bits)[0] for bits in iter_buffer_bits(codeBuffer, max(chunkBits // kept, 1) * kept))
+            decoder = StreamingViterbiDecoder(code, tbDepth, 'unquantized')
+        return BitBuffer.from_bits(np.concatenate(list(decoder.decode_stream(chunks))))
+
+    @classmethod
+    def Decode(cls, codedWord, tbDepth, isAWord, isPicture, decodingType='hard'):
         """
            A function that decodes encoded splice data into the original word.
             :param encodedWord: Encoded bit array
             :param tbDepth: Tracking depth for the Viterbi decoder
             :param asWord: Flag whether to return the result as word
             :param isPicture: A boolean value which defines the input data type
+            :param decodingType: 'hard' for bits, 'soft' for LLRs or 'unquantized' for real BPSK values
             :return: Decoded data as bit array or word
         """
+        decoded_bits = cls.__Decode(codedWord, tbDepth, decodingType)
         if isPicture:
-            decoded_bits = ConvolutionalCoder.__Decode(codedWord, tbDepth)
             return decoded_bits
 
-        expected_bit_length = len(codedWord) // 2
-        decoded_bits = ConvolutionalCoder.__Decode(codedWord, tbDepth)
-        decoded_bits = decoded_bits[:expected_bit_length]
+        # Drop the terminating tail, one bit per delay element
+        decoded_bits = decoded_bits[:max(len(decoded_bits) - cls.trellis.total_memory, 0)]
 
         if len(decoded_bits) % 8 != 0:
             decoded_bits = decoded_bits[:len(decoded_bits) - (len(decoded_bits) % 8)]
@@ -70,4 +120,42 @@ class ConvolutionalCoder:
             wholeWord = decode_bits_to_string(decoded_bits)
             return wholeWord
         else:
-            return decoded_bits
\ No newline at end of file
+            return decoded_bits
+
+    @classmethod
+    def DecodeBatch(cls, codedFrames, tbDepth, isAWord, decodingType='hard'):
+        """
+           A function that decodes many equally long encoded frames in one vectorized Viterbi pass.
+            :param codedFrames: (F, L) array of encoded frames
+            :param tbDepth: Tracking depth for the Viterbi decoder
+            :param isAWord: Flag whether to return the frames as words
+            :param decodingType: 'hard' for bits, 'soft' for LLRs or 'unquantized' for real BPSK values
+            :return: (F, bits) array of decoded data or a list of F words
+        """
+        codedFrames = np.asarray(codedFrames)
+        frameType = decodingType
+        if cls.trellis.puncture is not None:
+            depunctured = [cls.trellis.depuncture(frame, decodingType) for frame in codedFrames]
+            codedFrames = np.array([frame for frame, _ in depunctured]).reshape(len(depunctured), -1)
+            frameType = depunctured[0][1] if depunctured else decodingType
+        decoded_bits = viterbi_decode_batch(codedFrames, cls.trellis, tbDepth, frameType)
+        length = max(decoded_bits.shape[1] - cls.trellis.total_memory, 0)
+        decoded_bits = decoded_bits[:, :length - length % 8]
+
+        if isAWord:
+            return [decode_bits_to_string(frame.tolist()) for frame in decoded_bits]
+        else:
+            return decoded_bits
+
+    @classmethod
+    def StreamDecoder(cls, tbDepth, decodingType='hard'):
+        """
+           A function that creates a sliding-window decoder for encoded streams of any length.
+            :param tbDepth: Tracking depth for the Viterbi decoder
+            :param decodingType: 'hard' for bits, 'soft' for LLRs or 'unquantized' for real BPSK values
+            :return: StreamingViterbiDecoder accepting chunks of the encoded stream (push/flush or decode_stream)
+            :raises ValueError: For punctured codes, whose chunks must be depunctured first (see DecodePacked)
+        """
+        if cls.trellis.puncture is not None:
+            raise ValueError("Streams of punctured codes must be depunctured before decoding.")
+        return StreamingViterbiDecoder(cls.trellis, tbDepth, decodingType)
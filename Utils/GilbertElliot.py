@@ -1,8 +1,11 @@
 import numpy as np
+from Utils import Kernels
+from Utils.BitBuffer import BitBuffer
+from Utils.HelperFunctions import get_rng
 
 
 class GilbertElliottChannel:
-    def __init__(self, chance_for_bad, chance_for_good, p_err_good, p_err_bad):
+    def __init__(self, chance_for_bad, chance_for_good, p_err_good, p_err_bad, seed=None):
         """
             Initialize the Gilbert-Elliott channel with transition probabilities and BERs for each state.
 
@@ -10,12 +13,174 @@ class GilbertElliottChannel:
             :param chance_for_good: Probability of transitioning from the bad state to the good state (0.0 to 1.0).
             :param p_err_good: Bit error rate (BER) in the good state (0.0 to 1.0).
             :param p_err_bad: Bit error rate (BER) in the bad state (0.0 to 1.0).
+            :param seed: Seed or numpy Generator used for all random draws of the channel.
         """
         self.chance_for_bad = chance_for_bad
         self.chance_for_good = chance_for_good
         self.p_err_good = p_err_good
         self.p_err_bad = p_err_bad
         self.state = 0
+        self.rng = get_rng(seed)
+
+    def __leave_probability(self, state):
+        return self.chance_for_bad if state == 0 else self.chance_for_good
+
+    def __draw_sojourns(self, state, count, cap):
+        """
+            Draw the lengths of `count` consecutive complete runs spent in `state` (each at least 1 bit).
+            A state that is never left gets runs of length `cap`.
+        """
+        p = self.__leave_probability(state)
+        if p <= 0:
+            return np.full(count, cap, dtype=np.int64)
+        return self.rng.geometric(p, count)
+
+    def state_sequence(self, nbits):
+        """
+            Simulate the channel state for the next nbits bits and advance self.state.
+
+            The state is updated before every bit, exactly as in the per-bit model, so the number of bits
+            the channel still stays in its current state is geometric (it may be 0), and every later run is a
+            complete geometric sojourn of at least 1 bit. Runs are drawn in bulk, alternating between states.
+
+            :param nbits: Number of transmitted bits.
+            :return: A uint8 array of length nbits with the state (0 - good, 1 - bad) used for every bit.
+        """
+        states = np.empty(nbits, dtype=np.uint8)
+        if nbits == 0:
+            return states
+
+        # Bits left in the current state before the first transition
+        first = self.__draw_sojourns(self.state, 1, nbits + 1)[0] - 1
+        filled = min(first, nbits)
+        states[:filled] = self.state
+        current = 1 - self.state
+
+        # Mean length of a good+bad pair of runs, used to size each bulk draw
+        mean_pair = sum(1.0 / p if p > 0 else nbits for p in (self.chance_for_bad, self.chance_for_good))
+        while filled < nbits:
+            pairs = int((nbits - filled) / mean_pair * 1.25) + 16
+            runs = np.empty(2 * pairs, dtype=np.int64)
+            runs[0::2] = self.__draw_sojourns(current, pairs, nbits + 1)
+            runs[1::2] = self.__draw_sojourns(1 - current, pairs, nbits + 1)
+            ends = filled + np.cumsum(runs)
+            used = min(int(np.searchsorted(ends, nbits)) + 1, runs.size)
+            runs = runs[:used]
+            run_states = np.empty(used, dtype=np.uint8)
+            run_states[0::2] = current
+            run_states[1::2] = 1 - current
+            chunk = np.repeat(run_states, runs)[:nbits - filled]
+            states[filled:filled + chunk.size] = chunk
+            filled += chunk.size
+            # The next run starts in the state following the last (possibly truncated) one
+            current = 1 - run_states[-1]
+
+        self.state = int(states[-1])
+        return states
+
+    def error_buffer(self, nbits, chunk_bits=1 << 20):
+        """
+            Draw the error mask of the next nbits bits as a packed BitBuffer.
+
+            The states and errors are simulated chunk_bits bits at a time, with the state carried over
+            between chunks, so the memory used does not grow with nbits beyond the packed mask itself.
+
+            :param nbits: Number of transmitted bits.
+            :param chunk_bits: Number of bits simulated at once (a multiple of 8).
+            :return: A BitBuffer of nbits bits containing 1s (errors) or 0s (no errors).
+        """
+        mask = BitBuffer.zeros(nbits)
+        for start in range(0, nbits, chunk_bits):
+            states = self.state_sequence(min(chunk_bits, nbits - start))
+            packed = Kernels.ge_error_packed(states, self.rng.random(states.size), self.p_err_good, self.p_err_bad)
+            mask.data[start // 8:start // 8 + packed.size] = packed
+        return mask
+
+    def transmit(self, bits):
+        """
+            Simulate the transmission of a whole bit array over the Gilbert-Elliott channel.
+
+            Bits are sent in row-major order, so the channel state carries over between the rows of an
+            (N, 7) Hamming array and between consecutive calls.
+
+            :param bits: A flat or (N, 7) array (or nested list) of bits, or a packed BitBuffer.
+            :return: A tuple:
+                - received: A uint8 array of received bits with the shape of bits (a BitBuffer for a BitBuffer).
+                - errors: A uint8 array with the same shape containing 1s (errors) or 0s (no errors).
+        """
+        if isinstance(bits, BitBuffer):
+            errors = self.error_buffer(len(bits))
+            return bits ^ errors, errors
+        bits = np.asarray(bits, dtype=np.uint8)
+        states = self.state_sequence(bits.size)
+        errors = Kernels.ge_error_mask(states, self.rng.random(bits.size), self.p_err_good, self.p_err_bad)
+        errors = errors.reshape(bits.shape)
+        return bits ^ errors, errors
+
+    @staticmethod
+    def __log_tables(nominal, biased):
+        """
+            Log-likelihood ratios, nominal over biased, of one bit indexed by (previous state, state, error) and of
+            the state before a frame. Outcomes the biased channel never produces get 0 (they never occur).
+        """
+        def probabilities(chance_for_bad, chance_for_good, p_err_good, p_err_bad):
+            transition = np.array([[1 - chance_for_bad, chance_for_bad], [chance_for_good, 1 - chance_for_good]])
+            p_err = np.array([p_err_good, p_err_bad])
+            emission = np.stack((1 - p_err, p_err), axis=1)
+            bit = transition[:, :, None] * emission[None, :, :]
+            leave = chance_for_bad + chance_for_good
+            stationary = np.array([chance_for_good, chance_for_bad]) / leave if leave > 0 else np.array([1.0, 0.0])
+            return bit.ravel(), stationary
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tables = [np.where(q > 0, np.log(p) - np.log(q), 0.0)
+                      for p, q in zip(probabilities(*nominal), probabilities(*biased))]
+        return tables[0], tables[1]
+
+    def transmit_biased(self, bits, chance_for_bad=None, chance_for_good=None, p_err_good=None, p_err_bad=None):
+        """
+            Importance-sampling transmission: the channel runs with biased parameters (typically a larger
+            chance_for_bad, so more bits are sent in the bad state) and every frame gets the likelihood ratio of
+            its state and error sequence under the nominal parameters, so weighted error counts are unbiased.
+
+            Every frame's ratio includes its starting state relative to the stationary distributions, so the
+            channel state should be drawn from the stationary distribution of the biased chain before the call.
+
+            :param bits: A flat (one frame) or (F, L) (F frames sent back to back) array of bits.
+            :param chance_for_bad: Biased good -> bad probability (default: the nominal one); likewise for the
+                                   other parameters.
+            :return: A tuple:
+                - received: A uint8 array of received bits with the shape of bits.
+                - errors: A uint8 array with the same shape containing 1s (errors) or 0s (no errors).
+                - log_weights: float64 log-likelihood ratio (nominal / biased) of every frame, a 0-d array for
+                  a flat input.
+        """
+        nominal = (self.chance_for_bad, self.chance_for_good, self.p_err_good, self.p_err_bad)
+        biased = tuple(value if bias is None else bias
+                       for value, bias in zip(nominal, (chance_for_bad, chance_for_good, p_err_good, p_err_bad)))
+        bits = np.asarray(bits, dtype=np.uint8)
+        previous = self.state
+        self.chance_for_bad, self.chance_for_good, self.p_err_good, self.p_err_bad = biased
+        try:
+            states = self.state_sequence(bits.size)
+            errors = Kernels.ge_error_mask(states, self.rng.random(bits.size), self.p_err_good, self.p_err_bad)
+        finally:
+            self.chance_for_bad, self.chance_for_good, self.p_err_good, self.p_err_bad = nominal
+
+        bit_table, start_table = GilbertElliottChannel.__log_tables(nominal, biased)
+        frame_length = bits.shape[-1] if bits.ndim else 1
+        frames = int(np.prod(bits.shape[:-1])) if bits.ndim else 1
+        previous_states = np.concatenate(([previous], states[:-1])).astype(np.intp)
+        # Count the 8 (previous state, state, error) outcomes of every frame and weight them all at once
+        outcomes = (previous_states * 2 + states) * 2 + errors
+        counts = np.bincount(np.repeat(np.arange(frames) * 8, frame_length)[:bits.size] + outcomes,
+                             minlength=8 * frames).reshape(frames, 8)
+        log_weights = counts @ bit_table
+        if bits.size:
+            log_weights += start_table[previous_states[::frame_length]]
+        log_weights = log_weights.reshape(bits.shape[:-1])
+        errors = errors.reshape(bits.shape)
+        return bits ^ errors, errors, log_weights
 
     def transmitHamming(self, bitsarray):
         """
@@ -26,37 +191,8 @@ class GilbertElliottChannel:
                     - receivedArray: A list of lists, where each inner list contains the received bits after potential errors.
                     - errorsArray: A list of lists, where each inner list contains 1s (errors) or 0s (no errors).
         """
-        receivedArray = []
-        errorsArray = []
-        for array in bitsarray:
-            received = []
-            errors = []
-            for bit in array:
-                # State update
-                if self.state == 0:
-                    if np.random.rand() < self.chance_for_bad:
-                        self.state = 1
-                else:
-                    if np.random.rand() < self.chance_for_good:
-                        self.state = 0
-                # Error depending on the state
-                if self.state == 0:
-                    error = np.random.rand() < self.p_err_good
-                else:
-                    error = np.random.rand() < self.p_err_bad
-                errors.append(error)
-                received_bit = (bit + int(error)) % 2
-                received.append(received_bit)
-            receivedArray.append(received)
-            errorstemp = []
-            for error in errors:
-                if (error == True):
-                    errorstemp.append(1)
-                else:
-                    errorstemp.append(0)
-
-            errorsArray.append(errorstemp)
-        return receivedArray, errorsArray
+        received, errors = self.transmit(bitsarray)
+        return received.tolist(), errors.tolist()
 
     def transmitConvolutional(self, bitsarray):
         """
@@ -67,34 +203,5 @@ class GilbertElliottChannel:
                 - receivedArray: A list of received bits after potential errors.
                 - errorsArray: A list of 1s (errors) or 0s (no errors).
         """
-        receivedArray = []
-        errorsArray = []
-        for bit in bitsarray:
-            received = []
-            errors = []
-
-            # Aktualizacja stanu
-            if self.state == 0:
-                if np.random.rand() < self.chance_for_bad:
-                    self.state = 1
-            else:
-                if np.random.rand() < self.chance_for_good:
-                    self.state = 0
-            # Error depending on the state
-            if self.state == 0:
-                error = np.random.rand() < self.p_err_good
-            else:
-                error = np.random.rand() < self.p_err_bad
-            errors.append(error)
-            received_bit = (bit + int(error)) % 2
-            received.append(received_bit)
-            receivedArray.append(received)
-            errorstemp = []
-            for error in errors:
-                if (error == True):
-                    errorstemp.append(1)
-                else:
-                    errorstemp.append(0)
-
-            errorsArray.append(errorstemp)
-        return receivedArray, errorsArray
\ No newline at end of file
+        received, errors = self.transmit(np.asarray(bitsarray).reshape(-1, 1))
+        return received.tolist(), errors.tolist()
@@ -1,7 +1,32 @@
-from Utils.HelperFunctions import SplitWordTo4BitsArrays, Connect4BitsArraysToWord,splitIntoChunks
+import numpy as np
+from Utils.BitBuffer import BitBuffer
+from Utils.HelperFunctions import SplitWordTo4BitsArrays, Connect4BitsArraysToWord
 
 #hamming 7-4
 class Hamming:
+    # Generator matrix: codeword [p1, p2, d0, p3, d1, d2, d3] = data [d0, d1, d2, d3] @ G (mod 2)
+    G = np.array([[1, 1, 1, 0, 0, 0, 0],
+                  [1, 0, 0, 1, 1, 0, 0],
+                  [0, 1, 0, 1, 0, 1, 0],
+                  [1, 1, 0, 1, 0, 0, 1]], dtype=np.uint8)
+    # Parity check matrix: row j holds the binary representation of codeword position j + 1
+    H = np.array([[(position >> bit) & 1 for bit in range(3)] for position in range(1, 8)], dtype=np.uint8)
+    # Syndrome table: row s is the error pattern corrected for syndrome s (bit at position s)
+    SYNDROME_TABLE = np.vstack([np.zeros(7, dtype=np.uint8), np.eye(7, dtype=np.uint8)])
+    DATA_POSITIONS = [2, 4, 5, 6]
+
+    # Lookup tables of the packed path: a nibble maps to its codeword (7 bits, p1 most significant) and every
+    # possible received codeword maps to the corrected nibble, the raw data nibble and the number of corrections
+    _NIBBLE_BITS = np.unpackbits(np.arange(16, dtype=np.uint8).reshape(-1, 1), axis=1)[:, 4:]
+    _WORD_BITS = np.unpackbits(np.arange(128, dtype=np.uint8).reshape(-1, 1), axis=1)[:, 1:]
+    _SYNDROMES = ((_WORD_BITS @ H) & 1) @ np.array([1, 2, 4], dtype=np.uint8)
+    ENCODE_TABLE = np.packbits(np.pad((_NIBBLE_BITS @ G) & 1, ((0, 0), (1, 0))), axis=1).ravel()
+    DECODE_TABLE = np.packbits((_WORD_BITS ^ SYNDROME_TABLE[_SYNDROMES])[:, DATA_POSITIONS], axis=1).ravel() >> 4
+    RAW_TABLE = np.packbits(_WORD_BITS[:, DATA_POSITIONS], axis=1).ravel() >> 4
+    CORRECTION_TABLE = (_SYNDROMES != 0).astype(np.uint8)
+    # 8 codewords (56 bits) fill 7 bytes of the packed stream, the first codeword in the most significant bits
+    _SHIFTS = np.arange(49, -1, -7, dtype=np.uint64)
+
     # BITS PARITY CALCULATOR
     @staticmethod
     def __calculate_parity_bits(data):
@@ -66,6 +91,88 @@ class Hamming:
         # Return the corrected data bits
         return [encoded_data[2], encoded_data[4], encoded_data[5], encoded_data[6]]
 
+    @staticmethod
+    def EncodeBatch(dataBlocks):
+        """
+            Encode many 4-bit blocks at once with a single generator-matrix multiply (mod 2).
+            :param dataBlocks: An (N, 4) array of bits.
+            :return: An (N, 7) uint8 array of codewords.
+            :raises ValueError: If the blocks are not 4 bits long.
+        """
+        dataBlocks = np.asarray(dataBlocks, dtype=np.uint8)
+        if dataBlocks.ndim != 2 or dataBlocks.shape[1] != 4:
+            raise ValueError("Data must be an (N, 4) array of bits.")
+        return (dataBlocks @ Hamming.G) & 1
+
+    @staticmethod
+    def DecodeBatch(codewords):
+        """
+            Decode many 7-bit codewords at once, correcting single-bit errors through the syndrome table.
+            :param codewords: An (N, 7) array of bits.
+            :return: A tuple:
+                    - data: An (N, 4) uint8 array of corrected data bits.
+                    - corrections: An (N,) uint8 array with the number of bits corrected in every block.
+            :raises ValueError: If the codewords are not 7 bits long.
+        """
+        codewords = np.asarray(codewords, dtype=np.uint8)
+        if codewords.ndim != 2 or codewords.shape[1] != 7:
+            raise ValueError("Encoded data must be an (N, 7) array of bits.")
+        syndromes = ((codewords @ Hamming.H) & 1) @ np.array([1, 2, 4], dtype=np.uint8)
+        corrected = codewords ^ Hamming.SYNDROME_TABLE[syndromes]
+        return corrected[:, Hamming.DATA_POSITIONS], (syndromes != 0).astype(np.uint8)
+
+    @staticmethod
+    def EncodePacked(dataBuffer):
+        """
+            Encode a packed bit buffer, 4 data bits at a time, into a packed buffer of 7-bit codewords.
+            :param dataBuffer: A BitBuffer whose length is a multiple of 4.
+            :return: A BitBuffer with 7 bits for every 4 data bits, codewords back to back.
+            :raises ValueError: If the number of bits is not a multiple of 4.
+        """
+        if len(dataBuffer) % 4 != 0:
+            raise ValueError("Data must contain a multiple of 4 bits.")
+        groups = -(-len(dataBuffer) // 32)
+        data = np.zeros(groups * 4, dtype=np.uint8)
+        data[:dataBuffer.nbytes] = dataBuffer.data[:dataBuffer.nbytes]
+        nibbles = np.empty(groups * 8, dtype=np.uint8)
+        nibbles[0::2] = data >> 4
+        nibbles[1::2] = data & 0x0F
+        codewords = Hamming.ENCODE_TABLE[nibbles].reshape(groups, 8).astype(np.uint64)
+        packed_groups = np.bitwise_or.reduce(codewords << Hamming._SHIFTS, axis=1)
+        encoded = BitBuffer.zeros(len(dataBuffer) // 4 * 7)
+        stream = packed_groups.astype('>u8').view(np.uint8).reshape(groups, 8)[:, 1:].ravel()
+        encoded.data[:encoded.nbytes] = stream[:encoded.nbytes]
+        encoded.clear_tail()
+        return encoded
+
+    @staticmethod
+    def DecodePacked(codeBuffer, returnCorrections=False):
+        """
+            Decode a packed buffer of 7-bit codewords, correcting single-bit errors through lookup tables.
+            :param codeBuffer: A BitBuffer whose length is a multiple of 7.
+            :param returnCorrections: If True, also return the number of bits corrected in every block.
+            :return: A BitBuffer with the 4 data bits of every codeword,
+                     followed by the (N,) correction counts when returnCorrections is set.
+            :raises ValueError: If the number of bits is not a multiple of 7.
+        """
+        if len(codeBuffer) % 7 != 0:
+            raise ValueError("Encoded data must contain a multiple of 7 bits.")
+        count = len(codeBuffer) // 7
+        groups = -(-count // 8)
+        stream = np.zeros(groups * 7, dtype=np.uint8)
+        nbytes = min(codeBuffer.nbytes, stream.size)
+        stream[:nbytes] = codeBuffer.data[:nbytes]
+        packed_groups = np.zeros((groups, 8), dtype=np.uint8)
+        packed_groups[:, 1:] = stream.reshape(groups, 7)
+        words = packed_groups.view('>u8').ravel().astype(np.uint64)
+        codewords = ((words[:, None] >> Hamming._SHIFTS) & 0x7F).astype(np.uint8).ravel()[:count]
+        nibbles = np.zeros(-(-count // 2) * 2, dtype=np.uint8)
+        nibbles[:count] = Hamming.DECODE_TABLE[codewords]
+        decoded = BitBuffer.from_bytes((nibbles[0::2] << 4) | nibbles[1::2], count * 4)
+        if returnCorrections:
+            return decoded, Hamming.CORRECTION_TABLE[codewords]
+        return decoded
+
     @staticmethod
     def CodeDataHamming(word):
         """
@@ -84,17 +191,13 @@ class Hamming:
         """
             Encode image data into a list of 7-bit Hamming codes.
             :param imageData: A binary array representing the image data.
-            :return: A list of 7-bit encoded data arrays.
+            :return: An (N, 7) uint8 array of encoded data.
+            :raises ValueError: If the number of bits is not a multiple of 4.
         """
-        chunk_size = 4  # Size of each chunk
-        imageData_chunks = splitIntoChunks(imageData, chunk_size)  # Split into 4-element chunks
-
-        listabitencoded = []
-        for chunk in  imageData_chunks:
-            encoded_chunk = Hamming.__hamming_encode(chunk)
-            listabitencoded.append(encoded_chunk)
-
-        return listabitencoded
+        imageData = np.asarray(imageData, dtype=np.uint8).ravel()
+        if imageData.size % 4 != 0:
+            raise ValueError("Image data must contain a multiple of 4 bits.")
+        return Hamming.EncodeBatch(imageData.reshape(-1, 4))
 
     @staticmethod
     def DecodeInputDataHamming(wordCoded, asWord):
@@ -114,13 +217,15 @@ class Hamming:
             return decodedWord
 
     @staticmethod
-    def DecodeInputDataHammingObraz(wordCoded):
+    def DecodeInputDataHammingObraz(wordCoded, returnCorrections=False):
         """
-            Decode a list of 7-bit Hamming codes representing image data.
-            :param wordCoded: A list of 7-bit encoded data arrays.
-            :return: A list of 4-bit data arrays representing the original image data.
+            Decode 7-bit Hamming codes representing image data.
+            :param wordCoded: An (N, 7) array or a list of 7-bit encoded data arrays.
+            :param returnCorrections: If True, also return the number of bits corrected in every block.
+            :return: An (N, 4) uint8 array representing the original image data,
+                     followed by the (N,) correction counts when returnCorrections is set.
         """
-        decodedWord = []
-        for i,array in enumerate(wordCoded):
-            decodedWord.append(Hamming.__hamming_decode(array,i+1))
+        decodedWord, corrections = Hamming.DecodeBatch(np.asarray(wordCoded, dtype=np.uint8).reshape(-1, 7))
+        if returnCorrections:
+            return decodedWord, corrections
         return decodedWord
@@ -1,3 +1,7 @@
+import importlib
+import numpy as np
+from Utils.BitBuffer import BitBuffer
+
 # Converts a given char into bits
 def char_to_bit(char):
     # Step 1: Get the ASCII value of the character
@@ -103,4 +107,58 @@ def Connect4BitsArraysToWord(array):
         connected_table = join_4_bit_arrays(array1, array2)
         sign = bits_to_char(connected_table)
         word += sign
-    return word
\ No newline at end of file
+    return word
+
+# Returns a numpy Generator for the given seed; an existing Generator is passed through unchanged
+def get_rng(seed=None):
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+# Reads a binary file object block by block and yields its bits (most significant bit of each byte first)
+def iter_file_bits(file, block_size=1 << 16):
+    while True:
+        block = file.read(block_size)
+        if not block:
+            return
+        yield np.unpackbits(np.frombuffer(block, dtype=np.uint8))
+
+# Zero-copy uint8 view of the valid bytes of a packed BitBuffer
+def buffer_bytes(buffer):
+    return buffer.data[:buffer.nbytes]
+
+# Zero-copy uint64 view of a packed BitBuffer, for word-wise bit operations
+def buffer_words(buffer):
+    return buffer.words
+
+# Yields the bits of a packed BitBuffer unpacked chunk by chunk, so only chunk_bits bytes are expanded at a time
+def iter_buffer_bits(buffer, chunk_bits=1 << 16):
+    for start in range(0, len(buffer), chunk_bits):
+        yield buffer.bits(start, start + chunk_bits)
+
+# Converts a word into a packed BitBuffer (8 bits per character, as char_to_bit)
+def word_to_buffer(word):
+    return BitBuffer.from_bytes(np.array([ord(letter) for letter in word], dtype=np.uint8))
+
+# Converts a packed BitBuffer back into a word, dropping an incomplete last character
+def buffer_to_word(buffer):
+    return ''.join(map(chr, buffer_bytes(buffer)[:len(buffer) // 8]))
+
+# Imports a module attribute on first use, e.g. load('Utils.ReedSolomon', 'ReedSolomon'); later calls hit sys.modules
+def load(module, name):
+    return getattr(importlib.import_module(module), name)
+
+# Class attribute computed by the decorated function on first access and then stored on the class,
+# so expensive tables are only built by the runs that use them
+class cached_class_property:
+    def __init__(self, function):
+        self.function = function
+        self.name = function.__name__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        value = self.function(owner)
+        setattr(owner, self.name, value)
+        return value
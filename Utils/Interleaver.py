@@ -0,0 +1,95 @@
+import numpy as np
+from Utils.BitBuffer import BitBuffer
+
+INTERLEAVERS = ('block', 'helical', 'random')
+
+# Permutations built so far, keyed by (kind, size, depth, seed); values are (permutation, inverse)
+_PERMUTATIONS = {}
+
+
+def _grid_order(kind, rows, columns):
+    """Reading order of a rows x columns array written row by row, as flat indices into it."""
+    if kind == 'block':
+        return np.arange(rows * columns).reshape(rows, columns).T.ravel()
+    # Helical: every read steps one row down and one column to the right, wrapping around
+    row = np.tile(np.arange(rows), columns)
+    column = (np.repeat(np.arange(columns), rows) + row) % columns
+    return row * columns + column
+
+
+def permutation(kind, size, depth=None, seed=0):
+    """
+        Get the index vectors of an interleaver of the given size, building them on first use.
+
+        :param kind: 'block', 'helical' or 'random'.
+        :param size: Number of interleaved elements.
+        :param depth: Number of columns of the block and helical interleavers, i.e. the distance in the input
+                      between neighbouring output elements (default: about sqrt(size), the best burst spread).
+        :param seed: Seed of the random interleaver.
+        :return: A tuple (permutation, inverse); interleaved = data[permutation], data = interleaved[inverse].
+        :raises ValueError: If the kind is unknown or the depth is not positive.
+    """
+    if kind not in INTERLEAVERS:
+        raise ValueError(f"Unknown interleaver {kind!r}, expected one of {list(INTERLEAVERS)}.")
+    if kind == 'random':
+        depth = None
+    elif depth is None:
+        depth = max(int(np.ceil(np.sqrt(size))), 1)
+    elif depth < 1:
+        raise ValueError("The interleaver depth must be at least 1.")
+    key = (kind, int(size), depth, seed if kind == 'random' else None)
+    if key not in _PERMUTATIONS:
+        if kind == 'random':
+            order = np.random.default_rng(seed).permutation(size)
+        else:
+            order = _grid_order(kind, -(-size // depth), depth)
+            # A partly filled last row is skipped where it has no element
+            order = order[order < size]
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(size)
+        _PERMUTATIONS[key] = (order, inverse)
+    return _PERMUTATIONS[key]
+
+
+class Interleaver:
+    def __init__(self, kind, depth=None, seed=0):
+        """
+            Interleaver stage between the encoder and the channel, spreading channel error bursts over many
+            codewords. It permutes whole arrays with cached index vectors, so frames of the same size reuse them.
+
+            :param kind: 'block', 'helical' or 'random'.
+            :param depth: Number of columns of the block and helical interleavers (see permutation).
+            :param seed: Seed of the random interleaver; the de-interleaver must use the same one.
+            :raises ValueError: If the kind is unknown.
+        """
+        if kind not in INTERLEAVERS:
+            raise ValueError(f"Unknown interleaver {kind!r}, expected one of {list(INTERLEAVERS)}.")
+        self.kind = kind
+        self.depth = depth
+        self.seed = seed
+
+    def __repr__(self):
+        return f"Interleaver({self.kind!r}, depth={self.depth}, seed={self.seed})"
+
+    def __apply(self, data, inverse):
+        if isinstance(data, BitBuffer):
+            return BitBuffer.from_bits(self.__apply(data.bits(), inverse))
+        data = np.asarray(data)
+        indices = permutation(self.kind, data.size, self.depth, self.seed)[1 if inverse else 0]
+        return data.ravel()[indices].reshape(data.shape)
+
+    def interleave(self, data):
+        """
+            Permute the elements (bits, LLRs) of an array of any shape, or the bits of a BitBuffer.
+            :param data: Array, nested list or BitBuffer
+            :return: Interleaved array with the shape of data (a BitBuffer for a BitBuffer)
+        """
+        return self.__apply(data, False)
+
+    def deinterleave(self, data):
+        """
+            Undo interleave on received data (and on error masks, to get them in code order).
+            :param data: Array, nested list or BitBuffer
+            :return: De-interleaved array with the shape of data (a BitBuffer for a BitBuffer)
+        """
+        return self.__apply(data, True)
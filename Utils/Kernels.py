@@ -0,0 +1,149 @@
+"""
+Backend registry of the sequential hot loops (Viterbi add-compare-select, Gilbert-Elliott error draws).
+
+Every kernel has a NumPy implementation and, when numba is installed, a compiled one with the same
+signature and bit-identical results; the backend is selected when a kernel is first used (the FEC_KERNEL_BACKEND
+environment variable can force 'numpy' or 'numba'), so importing this module never imports numba, and can be
+switched with select(). Call sites use the module attributes (Kernels.acs_block, ...), so they never depend on
+the backend.
+"""
+import importlib.util
+import os
+
+import numpy as np
+
+BACKEND_VARIABLE = 'FEC_KERNEL_BACKEND'
+KERNEL_NAMES = ('acs_block', 'ge_error_mask', 'ge_error_packed')
+# Kernels of every backend, by backend name and kernel name
+BACKENDS = {'numpy': {}}
+
+
+def register(backend, name):
+    """Decorator adding a kernel implementation to a backend."""
+    def add(function):
+        BACKENDS.setdefault(backend, {})[name] = function
+        return function
+    return add
+
+
+# NumPy backend
+
+@register('numpy', 'acs_block')
+def _acs_block_numpy(path_metrics, block_metrics, entering_states, entering_outputs, decisions, metrics):
+    """
+        Add-compare-select over a block of steps.
+
+        :param path_metrics: (S, F) float64 path metrics before the first step.
+        :param block_metrics: (T, 2**n, F) float64 branch metrics.
+        :param entering_states: (2, S) predecessor states of the two branches entering every state.
+        :param entering_outputs: (2, S) codewords of these branches.
+        :param decisions: (>= T, S, F) bool output, True where the second branch survived.
+        :param metrics: (>= T, S, F) float64 output, the path metrics after every step.
+        :return: The path metrics after the last step (a view into metrics, or path_metrics for T = 0).
+    """
+    number_states, frames = path_metrics.shape
+    # With many frames, reusing the candidate buffers is much cheaper than allocating them every step
+    reuse_buffers = frames * number_states >= 1024
+    candidates = np.empty((2, number_states, frames))
+    branches = np.empty((2, number_states, frames))
+    for t in range(block_metrics.shape[0]):
+        if reuse_buffers:
+            np.take(path_metrics, entering_states, axis=0, out=candidates)
+            np.take(block_metrics[t], entering_outputs, axis=0, out=branches)
+            candidates += branches
+        else:
+            candidates = path_metrics[entering_states]
+            candidates += block_metrics[t][entering_outputs]
+        # Strict comparison keeps the first branch on ties, like argmin
+        np.less(candidates[1], candidates[0], out=decisions[t])
+        path_metrics = np.minimum(candidates[0], candidates[1], out=metrics[t])
+    return path_metrics
+
+
+@register('numpy', 'ge_error_mask')
+def _ge_error_mask_numpy(states, uniforms, p_err_good, p_err_bad):
+    """
+        Error bits of a Gilbert-Elliott channel from its state sequence: an error where the uniform draw of a
+        bit is below the error probability of its state.
+
+        :param states: uint8 array of states (0 - good, 1 - bad).
+        :param uniforms: float64 array of uniform draws, one per bit.
+        :return: uint8 array of error bits.
+    """
+    return (uniforms < np.where(states == 1, p_err_bad, p_err_good)).view(np.uint8)
+
+
+@register('numpy', 'ge_error_packed')
+def _ge_error_packed_numpy(states, uniforms, p_err_good, p_err_bad):
+    """Error bits as in ge_error_mask, packed MSB first (np.packbits layout)."""
+    return np.packbits(_ge_error_mask_numpy(states, uniforms, p_err_good, p_err_bad))
+
+
+# numba backend: the same loops compiled, cached on disk next to this module so later runs skip the warm-up
+
+def _register_numba():
+    import numba
+
+    @register('numba', 'acs_block')
+    @numba.njit(cache=True, nogil=True)
+    def _acs_block_numba(path_metrics, block_metrics, entering_states, entering_outputs, decisions, metrics):
+        frames = path_metrics.shape[1]
+        previous = path_metrics
+        for t in range(block_metrics.shape[0]):
+            for state in range(path_metrics.shape[0]):
+                state_0, state_1 = entering_states[0, state], entering_states[1, state]
+                output_0, output_1 = entering_outputs[0, state], entering_outputs[1, state]
+                for frame in range(frames):
+                    candidate_0 = previous[state_0, frame] + block_metrics[t, output_0, frame]
+                    candidate_1 = previous[state_1, frame] + block_metrics[t, output_1, frame]
+                    second = candidate_1 < candidate_0
+                    decisions[t, state, frame] = second
+                    metrics[t, state, frame] = candidate_1 if second else candidate_0
+            previous = metrics[t]
+        return previous
+
+    @register('numba', 'ge_error_mask')
+    @numba.njit(cache=True, nogil=True)
+    def _ge_error_mask_numba(states, uniforms, p_err_good, p_err_bad):
+        errors = np.empty(states.size, dtype=np.uint8)
+        for i in range(states.size):
+            errors[i] = uniforms[i] < (p_err_bad if states[i] == 1 else p_err_good)
+        return errors
+
+    @register('numba', 'ge_error_packed')
+    @numba.njit(cache=True, nogil=True)
+    def _ge_error_packed_numba(states, uniforms, p_err_good, p_err_bad):
+        packed = np.zeros((states.size + 7) // 8, dtype=np.uint8)
+        for i in range(states.size):
+            if uniforms[i] < (p_err_bad if states[i] == 1 else p_err_good):
+                packed[i >> 3] |= np.uint8(0x80 >> (i & 7))
+        return packed
+
+
+def select(backend=None):
+    """
+        Make the kernels of a backend the module's kernel functions.
+
+        :param backend: 'numpy' or 'numba'; by default the FEC_KERNEL_BACKEND environment variable, or numba when
+                        it is installed.
+        :return: The name of the selected backend.
+        :raises ValueError: If the backend is unknown or not available.
+    """
+    numba_available = importlib.util.find_spec('numba') is not None
+    if backend is None:
+        backend = os.environ.get(BACKEND_VARIABLE) or ('numba' if numba_available else 'numpy')
+    if backend == 'numba' and numba_available and 'numba' not in BACKENDS:
+        _register_numba()
+    if backend not in BACKENDS:
+        raise ValueError(f"Kernel backend {backend!r} is not available, expected one of {list(BACKENDS)}.")
+    globals().update(BACKENDS[backend])
+    globals()['BACKEND'] = backend
+    return backend
+
+
+def __getattr__(name):
+    # The kernels and BACKEND only exist once a backend is selected, which the first access does
+    if name in KERNEL_NAMES or name == 'BACKEND':
+        select()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,272 @@
+import numpy as np
+from reedsolo import RSCodec, ReedSolomonError, rs_forney_syndromes, rs_find_error_locator, rs_correct_errata
+from Utils.BitBuffer import BitBuffer
+from Utils.HelperFunctions import buffer_bytes, cached_class_property
+
+
+def _gf_tables(primitive):
+    """Antilog (doubled, so sums of two logs need no modulo) and log tables of GF(256) with generator 2."""
+    exp = np.zeros(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.intp)
+    value = 1
+    for power in range(255):
+        exp[power] = value
+        log[value] = power
+        value <<= 1
+        if value & 0x100:
+            value ^= primitive
+    exp[255:510] = exp[:255]
+    return exp, log
+
+
+def _generator(mul, exp, nsym):
+    """Generator polynomial (x - 1)(x - a)...(x - a^(nsym - 1)), coefficients highest degree first."""
+    generator = np.ones(1, dtype=np.uint8)
+    for root in exp[:nsym]:
+        generator = np.append(generator, 0) ^ np.append(0, mul[generator, root])
+    return generator
+
+
+def _unit_parity(generator, mul, k):
+    """
+    Parity bytes of the k messages with a single 1 byte: row i is x^(nsym + k - 1 - i) mod g(x). The code is
+    linear, so the parity of any message is the GF(256) sum of its bytes times these rows.
+    """
+    taps = generator[1:]
+    parity = np.zeros((k, taps.size), dtype=np.uint8)
+    remainder = taps.copy()  # x^nsym mod g(x), g being monic
+    parity[k - 1] = remainder
+    for position in range(k - 2, -1, -1):
+        remainder = np.append(remainder[1:], 0) ^ mul[remainder[0], taps]
+        parity[position] = remainder
+    return parity
+
+
+#reed-solomon (255, 223) over GF(256)
+class ReedSolomon:
+    N = 255
+    K = 223
+    NSYM = N - K  # parity bytes, up to NSYM // 2 byte errors (or NSYM erasures) are corrected per codeword
+    PRIMITIVE = 0x11d  # x^8 + x^4 + x^3 + x^2 + 1, the reedsolo default
+
+    # The tables are built on first use (about 20 ms), so runs with other coders do not pay for them
+    @cached_class_property
+    def EXP(cls):
+        return _gf_tables(cls.PRIMITIVE)[0]
+
+    @cached_class_property
+    def LOG(cls):
+        return _gf_tables(cls.PRIMITIVE)[1]
+
+    # Full multiplication table: MUL[a, b] = a * b in GF(256)
+    @cached_class_property
+    def MUL(cls):
+        nonzero = np.arange(256) != 0
+        return np.where(nonzero[:, None] & nonzero[None, :], cls.EXP[cls.LOG[:, None] + cls.LOG[None, :]],
+                        0).astype(np.uint8)
+
+    @cached_class_property
+    def GENERATOR(cls):
+        return _generator(cls.MUL, cls.EXP, cls.NSYM)
+
+    @cached_class_property
+    def PARITY_TABLE(cls):
+        return _unit_parity(cls.GENERATOR, cls.MUL, cls.K)
+
+    # Syndrome j is the received polynomial at a^j: SYNDROME_TABLE[i, j] = (a^j)^(N - 1 - i)
+    @cached_class_property
+    def SYNDROME_TABLE(cls):
+        return cls.EXP[(np.arange(cls.NSYM)[None, :] * np.arange(cls.N - 1, -1, -1)[:, None]) % 255]
+
+    # Every possible byte at position i times row i of the tables, the NSYM product bytes as uint64 words,
+    # so a matrix product is one lookup and one XOR of NSYM / 8 words per byte
+    @cached_class_property
+    def PARITY_PRODUCTS(cls):
+        return np.ascontiguousarray(cls.MUL[np.arange(256)[None, :, None],
+                                            cls.PARITY_TABLE[:, None, :]]).view(np.uint64)
+
+    @cached_class_property
+    def SYNDROME_PRODUCTS(cls):
+        return np.ascontiguousarray(cls.MUL[np.arange(256)[None, :, None],
+                                            cls.SYNDROME_TABLE[:, None, :]]).view(np.uint64)
+
+    _codec = None
+
+    @staticmethod
+    def __blocks(data, length):
+        """
+            Split bytes into blocks of the given length; the last block is shortened, i.e. padded with zeros in
+            front (leading zero coefficients do not change the codeword polynomial).
+            :return: A tuple ((blocks, length) array, number of padding bytes of the last block)
+        """
+        data = np.asarray(data, dtype=np.uint8).ravel()
+        count = -(-data.size // length)
+        padding = count * length - data.size
+        blocks = np.zeros((count, length), dtype=np.uint8)
+        last = (count - 1) * length if count else 0
+        blocks.ravel()[:last] = data[:last]
+        blocks.ravel()[last + padding:] = data[last:]
+        return blocks, padding
+
+    @staticmethod
+    def __unblocks(blocks, padding):
+        """Concatenate blocks, dropping the padding in front of the last one."""
+        flat = blocks.ravel()
+        if padding == 0:
+            return flat
+        last = (blocks.shape[0] - 1) * blocks.shape[1]
+        return np.concatenate((flat[:last], flat[last + padding:]))
+
+    @staticmethod
+    def __multiply_reduce(blocks, products):
+        """GF(256) product of every block (row) with a table, from its per-position product lookups."""
+        result = np.zeros((blocks.shape[0], products.shape[2]), dtype=np.uint64)
+        for position, column in enumerate(np.ascontiguousarray(blocks.T)):
+            result ^= products[position][column]
+        return result.view(np.uint8)
+
+    @staticmethod
+    def __error_positions(locator):
+        """Chien search: positions of the roots of the error locator (coefficients lowest degree first)."""
+        values = np.zeros(ReedSolomon.N, dtype=np.uint8)
+        points = ReedSolomon.EXP[:ReedSolomon.N]
+        for coefficient in locator[::-1]:
+            values = ReedSolomon.MUL[values, points] ^ np.uint8(coefficient)
+        roots = np.flatnonzero(values == 0)
+        if roots.size != len(locator) - 1:
+            return None
+        return (ReedSolomon.N - 1 - roots).tolist()
+
+    @staticmethod
+    def __correct(codeword, syndromes, erase_pos):
+        """
+            Correct one codeword from its (vectorized) syndromes with reedsolo's Berlekamp-Massey and Forney steps.
+            :return: The corrected codeword, or None if the errors cannot be located
+        """
+        if ReedSolomon._codec is None:
+            # Initializes reedsolo's global GF(256) tables for this field
+            ReedSolomon._codec = RSCodec(ReedSolomon.NSYM, ReedSolomon.N, prim=ReedSolomon.PRIMITIVE)
+        synd = [0] + syndromes.tolist()  # reedsolo's syndrome lists start with a 0
+        try:
+            forney = rs_forney_syndromes(synd, erase_pos, ReedSolomon.N)
+            locator = rs_find_error_locator(forney, ReedSolomon.NSYM, erase_count=len(erase_pos))
+            error_pos = ReedSolomon.__error_positions(locator)
+            if error_pos is None:
+                return None
+            corrected = rs_correct_errata(bytearray(codeword.tobytes()), synd, erase_pos + error_pos)
+        except (ReedSolomonError, ZeroDivisionError, ValueError):
+            return None
+        return np.frombuffer(bytes(corrected), dtype=np.uint8)
+
+    @staticmethod
+    def Syndromes(codewords):
+        """
+            Compute the syndromes of many codewords at once.
+            :param codewords: (blocks, N) uint8 array
+            :return: (blocks, NSYM) uint8 array, all zero for the codewords without errors
+        """
+        return ReedSolomon.__multiply_reduce(np.asarray(codewords, dtype=np.uint8), ReedSolomon.SYNDROME_PRODUCTS)
+
+    @staticmethod
+    def Encode(data):
+        """
+            Encode bytes into systematic RS(255, 223) codewords (data bytes first, then the parity bytes).
+            The last codeword is shortened to its data bytes plus the parity, so nothing but parity is added.
+            :param data: uint8 array or bytes
+            :return: uint8 array of the concatenated codewords
+        """
+        blocks, padding = ReedSolomon.__blocks(data, ReedSolomon.K)
+        codewords = np.concatenate((blocks, ReedSolomon.__multiply_reduce(blocks, ReedSolomon.PARITY_PRODUCTS)), axis=1)
+        return ReedSolomon.__unblocks(codewords, padding)
+
+    @staticmethod
+    def Decode(received, returnCorrections=False, erasures=None):
+        """
+            Decode concatenated RS(255, 223) codewords (see Encode) back into the data bytes.
+
+            Syndromes of all codewords are computed at once; only codewords with a non-zero syndrome go through
+            the Berlekamp-Massey / Forney decoder. A codeword with too many errors is passed on as received.
+            :param received: uint8 array of received bytes
+            :param returnCorrections: Also return the number of corrected bytes of every codeword and a mask of
+                                      the codewords that could not be corrected
+            :param erasures: Optional bool array like received marking unreliable bytes (soft information);
+                             with at most NSYM erasures a codeword can have twice as many of its errors corrected
+            :return: uint8 array of data bytes, with the corrections and failure mask if requested
+        """
+        n, k = ReedSolomon.N, ReedSolomon.K
+        received = np.asarray(received, dtype=np.uint8).ravel()
+        codewords, padding = ReedSolomon.__blocks(received, n)
+        if padding > k:
+            raise ValueError("The last codeword is shorter than its parity bytes.")
+        received_codewords = codewords.copy()
+        corrections = np.zeros(codewords.shape[0], dtype=np.intp)
+        failed = np.zeros(codewords.shape[0], dtype=bool)
+        if erasures is not None:
+            erasures = ReedSolomon.__blocks(np.asarray(erasures, dtype=np.uint8), n)[0].astype(bool)
+            # Codewords with more erasures than parity bytes are decoded without them; erased bytes are zeroed,
+            # as reedsolo does, so the syndromes only depend on the erasure positions
+            erasures &= (erasures.sum(axis=1) <= ReedSolomon.NSYM)[:, None]
+            codewords[erasures] = 0
+        syndromes = ReedSolomon.Syndromes(codewords)
+        damaged = np.flatnonzero(syndromes.any(axis=1))
+        for index in damaged:
+            erase_pos = [] if erasures is None else np.flatnonzero(erasures[index]).tolist()
+            corrected = ReedSolomon.__correct(codewords[index], syndromes[index], erase_pos)
+            if corrected is None:
+                failed[index] = True
+            else:
+                codewords[index] = corrected
+        # A wrong correction of a codeword with too many errors does not leave a valid codeword behind
+        failed[damaged[ReedSolomon.Syndromes(codewords[damaged]).any(axis=1)]] = True
+        codewords[failed] = received_codewords[failed]
+        corrections[damaged] = np.count_nonzero(codewords[damaged] != received_codewords[damaged], axis=1)
+
+        data = ReedSolomon.__unblocks(np.ascontiguousarray(codewords[:, :k]), padding)
+        if returnCorrections:
+            return data, corrections, failed
+        return data
+
+    @staticmethod
+    def EncodePacked(dataBuffer):
+        """
+            Encode the bytes of a packed bit buffer.
+            :param dataBuffer: BitBuffer of data bits (a whole number of bytes)
+            :return: BitBuffer of the codeword bytes
+        """
+        return BitBuffer.from_bytes(ReedSolomon.Encode(buffer_bytes(dataBuffer)))
+
+    @staticmethod
+    def DecodePacked(codeBuffer, returnCorrections=False):
+        """
+            Decode a packed buffer of received codeword bytes.
+            :param codeBuffer: BitBuffer of received bits (a whole number of bytes)
+            :param returnCorrections: Also return the corrections and the failure mask (see Decode)
+            :return: BitBuffer of the data bytes, with the corrections and failure mask if requested
+        """
+        decoded = ReedSolomon.Decode(buffer_bytes(codeBuffer), returnCorrections)
+        if returnCorrections:
+            return BitBuffer.from_bytes(decoded[0]), decoded[1], decoded[2]
+        return BitBuffer.from_bytes(decoded)
+
+    @staticmethod
+    def CodeData(word):
+        """
+            Encode a word (string of 8-bit characters).
+            :param word: The word to encode
+            :return: List of the bits of the codeword bytes
+        """
+        data = np.array([ord(character) for character in word], dtype=np.uint8)
+        return np.unpackbits(ReedSolomon.Encode(data)).tolist()
+
+    @staticmethod
+    def DecodeData(codedBits, asWord):
+        """
+            Decode the received bits of an encoded word.
+            :param codedBits: Received bits (flat or nested list / array)
+            :param asWord: Flag whether to return the result as word
+            :return: The decoded word, or the decoded data bits
+        """
+        data = ReedSolomon.Decode(np.packbits(np.asarray(codedBits, dtype=np.uint8).ravel()))
+        if asWord:
+            return ''.join(map(chr, data.tolist()))
+        return np.unpackbits(data).tolist()
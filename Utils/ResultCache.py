@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get('FEC_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'fec-transmission-simulation')),
+    'results.sqlite')
+
+
+def _canonical(value):
+    """JSON text of a value that does not depend on dictionary order or numpy scalar types."""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=lambda item: item.item())
+
+
+def cache_key(spec):
+    """Content address of a simulation point described by the dictionary spec."""
+    return hashlib.sha256(_canonical(spec).encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=64 * 1024 * 1024):
+        """
+            Persistent store of simulation results keyed by the content of their specification.
+
+            Every entry holds the JSON specification (coder, channel parameters, message length, seed, ...) and
+            the JSON result (BER, FER, correction counts, wall time, ...). When the stored entries grow beyond
+            max_bytes the least recently used ones are evicted.
+
+            :param path: SQLite database file (created if missing), or ':memory:'.
+            :param max_bytes: Maximum total size of the stored specifications and results.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, spec TEXT NOT NULL, result TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.connection.commit()
+
+    def get(self, spec):
+        """
+            Look up the result of a simulation point.
+            :param spec: Dictionary describing the point.
+            :return: The stored result dictionary, or None if the point has not been computed.
+        """
+        key = cache_key(spec)
+        row = self.connection.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        return json.loads(row[0])
+
+    def put(self, spec, result):
+        """
+            Store the result of a simulation point and evict the least recently used entries if needed.
+            :param spec: Dictionary describing the point.
+            :param result: JSON-serializable result dictionary.
+        """
+        spec_text, result_text = _canonical(spec), _canonical(result)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results (key, spec, result, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            (cache_key(spec), spec_text, result_text, len(spec_text) + len(result_text), time.time()))
+        self.__evict()
+        self.connection.commit()
+
+    def get_or_compute(self, spec, compute):
+        """
+            Return the stored result of a point, computing and storing it with compute() when it is missing.
+        """
+        result = self.get(spec)
+        if result is None:
+            result = compute()
+            self.put(spec, result)
+        return result
+
+    def size(self):
+        """Total size in bytes of the stored entries."""
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def __evict(self):
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in self.connection.execute("SELECT key, size FROM results ORDER BY last_used"):
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+        self.connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def clear(self):
+        """Remove all entries."""
+        self.connection.execute("DELETE FROM results")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,85 @@
+import time
+
+from Utils.BitBuffer import BitBuffer
+from Utils.HelperFunctions import get_rng, buffer_bytes, load
+
+CODERS = ('hamming', 'convolutional', 'reed_solomon', 'concatenated')
+
+# Module and class of every coder, imported when a stream uses it
+CODER_CLASSES = {
+    'hamming': ('Utils.Hamming', 'Hamming'),
+    'convolutional': ('Utils.Convolutional', 'ConvolutionalCoder'),
+    'reed_solomon': ('Utils.ReedSolomon', 'ReedSolomon'),
+    'concatenated': ('Utils.Concatenated', 'ConcatenatedCoder'),
+}
+
+
+def read_blocks(stream, block_size=1 << 16):
+    """Yield the content of a binary stream (file or stdin) in blocks of at most block_size bytes."""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            return
+        yield block
+
+
+def make_channel(channel, params, seed=None):
+    """
+        Build the transmit function of a channel; the Gilbert-Elliott state carries over between blocks.
+
+        :param channel: 'bsc' or 'gilbert_elliott'.
+        :param params: The BER of the BSC or the 4 Gilbert-Elliott parameters.
+        :param seed: Seed or numpy Generator of the channel.
+        :return: A function taking a BitBuffer and returning (received, errors) BitBuffers.
+        :raises ValueError: If the channel is unknown.
+    """
+    rng = get_rng(seed)
+    if channel == 'bsc':
+        bsc_transmit = load('Utils.BSC', 'bsc_transmit')
+        return lambda bits: bsc_transmit(bits, params, rng)
+    elif channel == 'gilbert_elliott':
+        return load('Utils.GilbertElliot', 'GilbertElliottChannel')(*params, seed=rng).transmit
+    raise ValueError(f"Unknown channel {channel!r}, expected 'bsc' or 'gilbert_elliott'.")
+
+
+def transmit_stream(blocks, coder, transmit, tb_depth=10, interleaver=None):
+    """
+        Encode, transmit and decode a stream block by block; memory use depends only on the block size.
+
+        Every block is coded as a frame of its own (a terminated convolutional frame), so blocks are
+        independent apart from the channel state.
+
+        :param blocks: Iterable of bytes (see read_blocks).
+        :param coder: 'hamming', 'convolutional', 'reed_solomon' or 'concatenated' (Reed-Solomon + convolutional).
+        :param transmit: Transmit function of the channel (see make_channel).
+        :param tb_depth: Traceback depth of the Viterbi decoder.
+        :param interleaver: Optional Interleaver permuting every encoded block before the channel.
+        :return: Generator of (decoded bytes, statistics) per block, the statistics being running totals of
+                 bytes, coded_bits, channel_errors, bit_errors and the elapsed seconds.
+        :raises ValueError: If the coder is unknown.
+    """
+    if coder not in CODERS:
+        raise ValueError(f"Unknown coder {coder!r}, expected one of {list(CODERS)}.")
+    coder_class = load(*CODER_CLASSES[coder])
+    stats = {'bytes': 0, 'coded_bits': 0, 'channel_errors': 0, 'bit_errors': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+    for block in blocks:
+        data = BitBuffer.from_bytes(block)
+        encoded = coder_class.EncodePacked(data)
+        if interleaver is None:
+            received, errors = transmit(encoded)
+        else:
+            received, errors = transmit(interleaver.interleave(encoded))
+            received = interleaver.deinterleave(received)
+        if coder in ('hamming', 'reed_solomon'):
+            decoded = coder_class.DecodePacked(received)
+        elif coder == 'convolutional':
+            decoded = BitBuffer.from_bytes(buffer_bytes(coder_class.DecodePacked(received, tb_depth)), len(data))
+        else:
+            decoded = coder_class.DecodePacked(received, tb_depth)
+        stats['bytes'] += len(block)
+        stats['coded_bits'] += len(received)
+        stats['channel_errors'] += errors.count()
+        stats['bit_errors'] += (decoded ^ data).count()
+        stats['seconds'] = time.perf_counter() - start
+        yield buffer_bytes(decoded).tobytes(), dict(stats)
@@ -0,0 +1,379 @@
+import hashlib
+import json
+import math
+import os
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from Utils.AWGN import awgn_llr, hard_decisions
+from Utils.Analytic import estimate as estimate_point
+from Utils.BSC import bsc_transmit, bsc_transmit_biased
+from Utils.GilbertElliot import GilbertElliottChannel
+from Utils.Hamming import Hamming
+from Utils.Convolutional import ConvolutionalCoder
+from Utils.Viterbi import viterbi_decode_batch
+
+CODERS = ('hamming', 'convolutional')
+CHANNELS = {
+    'bsc': ('ber',),
+    'gilbert_elliott': ('chance_for_bad', 'chance_for_good', 'p_err_good', 'p_err_bad'),
+    'awgn': ('ebn0_db',),
+}
+
+
+def parameter_grid(channel, **values):
+    """
+        Build the grid of channel parameters as the cartesian product of the given values.
+
+        :param channel: 'bsc', 'gilbert_elliott' or 'awgn'.
+        :param values: A list of values for every parameter of the channel (e.g. ber=[0.01, 0.02]).
+        :return: A list of parameter dictionaries.
+        :raises ValueError: If the channel is unknown or a parameter is missing.
+    """
+    if channel not in CHANNELS:
+        raise ValueError(f"Unknown channel {channel!r}, expected one of {list(CHANNELS)}.")
+    names = CHANNELS[channel]
+    missing = [name for name in names if name not in values]
+    if missing:
+        raise ValueError(f"Missing values for {missing}.")
+    return [dict(zip(names, point)) for point in itertools.product(*(values[name] for name in names))]
+
+
+def wilson_interval(errors, trials, z=1.96):
+    """Wilson score confidence interval of an error rate estimated from errors out of trials."""
+    if trials == 0:
+        return 0.0, 1.0
+    rate = errors / trials
+    denominator = 1 + z * z / trials
+    center = (rate + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def _transmit(encoded, channel, params, rng, rate, importance_bias=None):
+    """
+        Send the (F, L) encoded frames back to back through the channel and return the received frames:
+        bits, or float32 LLRs for the AWGN channel (BPSK at the Eb/N0 of the information bits, given the code rate).
+
+        With an importance_bias the BSC flip probability (or the Gilbert-Elliott good -> bad probability) is
+        multiplied by it, and the log-likelihood ratio of every frame is returned as well; otherwise None is.
+        :return: A tuple (received, log_weights).
+    """
+    if channel == 'awgn':
+        return awgn_llr(encoded, params['ebn0_db'], rate, rng=rng).reshape(encoded.shape), None
+    if channel == 'bsc':
+        if importance_bias is None:
+            received, _ = bsc_transmit(encoded, params['ber'], rng)
+            return received, None
+        ber = params['ber']
+        biased_ber = min(ber * importance_bias, 0.5) if ber > 0 else 0.5
+        received, _, log_weights = bsc_transmit_biased(encoded, ber, biased_ber, rng)
+        return received, log_weights
+    chance_for_bad, chance_for_good = params['chance_for_bad'], params['chance_for_good']
+    ge_channel = GilbertElliottChannel(chance_for_bad, chance_for_good, params['p_err_good'], params['p_err_bad'],
+                                       seed=rng)
+    if importance_bias is not None:
+        chance_for_bad = min(chance_for_bad * importance_bias, 1.0)
+    # Start in the stationary distribution (of the chain actually simulated) so that independent tasks are not
+    # biased towards the good state
+    if chance_for_bad + chance_for_good > 0:
+        ge_channel.state = int(rng.random() < chance_for_bad / (chance_for_bad + chance_for_good))
+    if importance_bias is None:
+        received, _ = ge_channel.transmit(encoded)
+        return received, None
+    received, _, log_weights = ge_channel.transmit_biased(encoded, chance_for_bad=chance_for_bad)
+    return received, log_weights
+
+
+def weighted_interval(total, total_squares, trials, z=1.96):
+    """
+        Mean of importance-sampling terms (weight times error indicator or count, one per trial) with its normal
+        confidence interval, from their sum and sum of squares.
+        :return: A tuple (estimate, low, high).
+    """
+    if trials == 0:
+        return 0.0, 0.0, 1.0
+    mean = total / trials
+    if total > 0 and total_squares <= 0:
+        # The squares of tiny weights underflowed: the spread is unknown, not zero
+        return mean, 0.0, math.inf
+    variance = max(total_squares / trials - mean * mean, 0.0) * trials / max(trials - 1, 1)
+    half_width = z * math.sqrt(variance / trials)
+    return mean, max(0.0, mean - half_width), mean + half_width
+
+
+def run_trials(coder, tb_depth, channel, params, frame_bits, frames, seed, importance_bias=None):
+    """
+        Encode, transmit and decode a batch of random frames and count the errors.
+
+        :param coder: 'hamming' or 'convolutional'.
+        :param tb_depth: Traceback depth of the Viterbi decoder.
+        :param channel: 'bsc', 'gilbert_elliott' or 'awgn'.
+        :param params: Channel parameters.
+        :param frame_bits: Number of message bits per frame (a multiple of 4 for Hamming).
+        :param frames: Number of frames in the batch.
+        :param seed: numpy SeedSequence (or seed) of the batch.
+        :param importance_bias: Importance-sampling bias of the channel (see _transmit); every frame keeps the
+                                likelihood ratio of its channel draw through decoding.
+        :return: A dictionary with the bit, bit error, frame, frame error and correction counts; with an
+                 importance_bias also the sums (and sums of squares) of the weighted bit and frame errors.
+    """
+    rng = np.random.default_rng(seed)
+    messages = rng.integers(0, 2, (frames, frame_bits), dtype=np.uint8)
+    corrections = 0
+
+    if coder == 'hamming':
+        encoded = Hamming.EncodeBatch(messages.reshape(-1, 4)).reshape(frames, -1)
+        received, log_weights = _transmit(encoded, channel, params, rng, 4 / 7, importance_bias)
+        if channel == 'awgn':
+            received = hard_decisions(received)
+        decoded, corrected = Hamming.DecodeBatch(received.reshape(-1, 7))
+        decoded = decoded.reshape(frames, frame_bits)
+        corrections = int(corrected.sum())
+    elif coder == 'convolutional':
+        encoded = np.array([ConvolutionalCoder.trellis.encode(message) for message in messages])
+        received, log_weights = _transmit(encoded, channel, params, rng, frame_bits / encoded.shape[1],
+                                          importance_bias)
+        decoding_type = 'soft' if channel == 'awgn' else 'hard'
+        decoded = viterbi_decode_batch(received, ConvolutionalCoder.trellis, tb_depth, decoding_type)[:, :frame_bits]
+    else:
+        raise ValueError(f"Unknown coder {coder!r}, expected one of {list(CODERS)}.")
+
+    errors_per_frame = np.count_nonzero(decoded != messages, axis=1)
+    counts = {
+        'bits': frames * frame_bits,
+        'bit_errors': int(errors_per_frame.sum()),
+        'frames': frames,
+        'frame_errors': int(np.count_nonzero(errors_per_frame)),
+        'corrections': corrections,
+    }
+    if log_weights is not None:
+        # Frames stay in order through the decoder, so the weight of a frame applies to its decoded errors
+        weights = np.exp(log_weights)
+        bit_terms = weights * errors_per_frame / frame_bits
+        frame_terms = weights * (errors_per_frame > 0)
+        counts.update({
+            'weighted_bit_errors': float(bit_terms.sum()),
+            'weighted_bit_errors_sq': float(bit_terms @ bit_terms),
+            'weighted_frame_errors': float(frame_terms.sum()),
+            'weighted_frame_errors_sq': float(frame_terms @ frame_terms),
+        })
+    return counts
+
+
+def point_seed(seed, params):
+    """
+        Random stream of a grid point, derived from the root seed and the point's own parameters, so it does
+        not change when other points are added to the grid.
+    """
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).digest()
+    return np.random.SeedSequence([seed, *np.frombuffer(digest, dtype=np.uint32).tolist()])
+
+
+class _PointState:
+    """Accumulated statistics and stopping rule of one grid point."""
+
+    def __init__(self, params, seed_sequence, weighted=False):
+        self.params = params
+        self.seed_sequence = seed_sequence
+        self.counts = {'bits': 0, 'bit_errors': 0, 'frames': 0, 'frame_errors': 0, 'corrections': 0}
+        # Importance sampling: the estimates come from the weighted error sums instead of the raw counts
+        self.weighted = weighted
+        if weighted:
+            self.counts.update({'weighted_bit_errors': 0.0, 'weighted_bit_errors_sq': 0.0,
+                                'weighted_frame_errors': 0.0, 'weighted_frame_errors_sq': 0.0})
+        self.in_flight = 0
+        self.done = False
+        self.started = None
+        self.wall_time = 0.0
+
+    def next_seed(self):
+        return self.seed_sequence.spawn(1)[0]
+
+    def add(self, counts):
+        for key in self.counts:
+            self.counts[key] += counts[key]
+
+    def __weighted(self, name):
+        counts = self.counts
+        return weighted_interval(counts[f'weighted_{name}'], counts[f'weighted_{name}_sq'], counts['frames'])
+
+    def should_stop(self, target_errors, rel_precision, max_bits):
+        bits, bit_errors = self.counts['bits'], self.counts['bit_errors']
+        if bits >= max_bits:
+            return True
+        if self.weighted:
+            # The biased channel makes raw errors plentiful, so they only set a minimum sample size
+            if bit_errors < target_errors:
+                return False
+            ber, low, high = self.__weighted('bit_errors')
+            return ber > 0 and (high - low) / 2 <= rel_precision * ber
+        if bit_errors >= target_errors:
+            return True
+        if bit_errors == 0:
+            return False
+        low, high = wilson_interval(bit_errors, bits)
+        return (high - low) / 2 <= rel_precision * bit_errors / bits
+
+    def result(self):
+        counts = self.counts
+        if self.weighted:
+            ber, ber_low, ber_high = self.__weighted('bit_errors')
+            fer, fer_low, fer_high = self.__weighted('frame_errors')
+        else:
+            ber, fer = counts['bit_errors'] / max(counts['bits'], 1), counts['frame_errors'] / max(counts['frames'], 1)
+            ber_low, ber_high = wilson_interval(counts['bit_errors'], counts['bits'])
+            fer_low, fer_high = wilson_interval(counts['frame_errors'], counts['frames'])
+        return {
+            **self.params,
+            **counts,
+            'decoded_ber': ber,
+            'decoded_ber_low': ber_low,
+            'decoded_ber_high': ber_high,
+            'decoded_fer': fer,
+            'decoded_fer_low': fer_low,
+            'decoded_fer_high': fer_high,
+            'wall_time': self.wall_time,
+        }
+
+
+def _analytic_result(params, estimate):
+    """
+        Result dictionary of a grid point taken from an analytic estimate instead of a simulation; a union bound
+        is reported as the upper end of the interval.
+    """
+    ber, fer = estimate['decoded_ber'], estimate['decoded_fer']
+    exact = estimate['method'] == 'exact'
+    return {
+        **params,
+        'bits': 0, 'bit_errors': 0, 'frames': 0, 'frame_errors': 0, 'corrections': 0,
+        'decoded_ber': ber, 'decoded_ber_low': ber if exact else 0.0, 'decoded_ber_high': ber,
+        'decoded_fer': fer, 'decoded_fer_low': fer if exact else 0.0, 'decoded_fer_high': fer,
+        'wall_time': 0.0,
+        'method': estimate['method'],
+    }
+
+
+def run_sweep(coder, channel, grid, frame_bits=1024, frames_per_task=64, target_errors=100, rel_precision=0.1,
+              max_bits=10 ** 8, workers=None, seed=0, tb_depth=10, progress=None, cache=None, analytic=False,
+              importance_bias=None):
+    """
+        Estimate BER/FER of a coder over a channel at every point of a parameter grid.
+
+        Batches of frames are sharded over a process pool, every batch with its own independent random
+        stream spawned from seed, and a grid point stops as soon as target_errors bit errors have been
+        seen, the 95% confidence interval of its BER is within rel_precision of the estimate, or max_bits
+        bits have been simulated.
+
+        :param coder: 'hamming' or 'convolutional'.
+        :param channel: 'bsc', 'gilbert_elliott' or 'awgn'.
+        :param grid: A list of channel parameter dictionaries (see parameter_grid).
+        :param frame_bits: Number of message bits per frame.
+        :param frames_per_task: Number of frames simulated by one task.
+        :param target_errors: Number of bit errors after which a point stops.
+        :param rel_precision: Relative half-width of the BER confidence interval after which a point stops.
+        :param max_bits: Maximum number of simulated message bits per point.
+        :param workers: Number of worker processes (default: all cores).
+        :param seed: Root seed of the sweep.
+        :param tb_depth: Traceback depth of the Viterbi decoder.
+        :param progress: Optional callback called with the result of every finished point.
+        :param cache: Optional ResultCache; points already stored are not simulated again.
+        :param analytic: Take the BER/FER of points with an exact or tight closed form from Utils.Analytic and
+                         simulate only the others; every result then also has the 'method' it was obtained with
+                         and the analytic estimate ('analytic_ber', 'analytic_fer', None where there is none).
+        :param importance_bias: Importance sampling for very low error rates: the BSC flip probability or the
+                                Gilbert-Elliott good -> bad probability is multiplied by this factor, and the
+                                BER/FER come from the likelihood-ratio weighted errors (with normal confidence
+                                intervals). target_errors is then the minimum number of raw errors of a point.
+        :return: A list with the result dictionary of every grid point, in grid order: the channel parameters,
+                 the counts, the decoded BER/FER with their confidence bounds and the wall time.
+        :raises ValueError: If the coder or channel is unknown, frame_bits does not fit the coder or importance
+                            sampling is requested on the AWGN channel or with a bias below 1.
+    """
+    if coder not in CODERS:
+        raise ValueError(f"Unknown coder {coder!r}, expected one of {list(CODERS)}.")
+    if channel not in CHANNELS:
+        raise ValueError(f"Unknown channel {channel!r}, expected one of {list(CHANNELS)}.")
+    if coder == 'hamming' and frame_bits % 4 != 0:
+        raise ValueError("Hamming frames must contain a multiple of 4 bits.")
+    if importance_bias is not None:
+        if channel == 'awgn':
+            raise ValueError("Importance sampling is only available on the BSC and Gilbert-Elliott channels.")
+        if importance_bias < 1:
+            raise ValueError("The importance sampling bias must be at least 1.")
+
+    workers = workers or os.cpu_count() or 1
+    points = [_PointState(params, point_seed(seed, params), importance_bias is not None) for params in grid]
+
+    def specification(point):
+        return {'coder': coder, 'tb_depth': tb_depth if coder == 'convolutional' else None, 'channel': channel,
+                'params': point.params, 'frame_bits': frame_bits, 'frames_per_task': frames_per_task,
+                'target_errors': target_errors, 'rel_precision': rel_precision, 'max_bits': max_bits,
+                'seed': seed, **({'importance_bias': importance_bias} if importance_bias is not None else {})}
+
+    cached_results = {}
+    estimates = {}
+    if analytic:
+        for point in points:
+            estimate = estimate_point(coder, channel, point.params, frame_bits=frame_bits, tb_depth=tb_depth)
+            estimates[id(point)] = estimate
+            if not estimate['simulate']:
+                point.done = True
+                cached_results[id(point)] = _analytic_result(point.params, estimate)
+                if progress is not None:
+                    progress(cached_results[id(point)])
+    if cache is not None:
+        for point in points:
+            if point.done:
+                continue
+            result = cache.get(specification(point))
+            if result is not None:
+                point.done = True
+                cached_results[id(point)] = result
+                if progress is not None:
+                    progress(result)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def fill():
+            # Keep every worker busy, giving the next task to the unfinished point with the fewest in flight
+            active = [point for point in points if not point.done]
+            while active and len(pending) < 2 * workers:
+                point = min(active, key=lambda candidate: candidate.in_flight)
+                if point.started is None:
+                    point.started = time.perf_counter()
+                future = executor.submit(run_trials, coder, tb_depth, channel, point.params, frame_bits,
+                                         frames_per_task, point.next_seed(), importance_bias)
+                pending[future] = point
+                point.in_flight += 1
+
+        fill()
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                point = pending.pop(future)
+                point.in_flight -= 1
+                if point.done:
+                    continue
+                point.add(future.result())
+                if point.should_stop(target_errors, rel_precision, max_bits):
+                    point.done = True
+                    point.wall_time = time.perf_counter() - point.started
+                    if cache is not None:
+                        cache.put(specification(point), point.result())
+                    if progress is not None:
+                        progress(point.result())
+            fill()
+
+    results = [cached_results.get(id(point)) or point.result() for point in points]
+    if analytic:
+        for point, result in zip(points, results):
+            estimate = estimates[id(point)]
+            result.setdefault('method', 'simulation')
+            result['analytic_ber'] = estimate['decoded_ber']
+            result['analytic_fer'] = estimate['decoded_fer']
+    return results
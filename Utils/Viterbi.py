@@ -0,0 +1,347 @@
+import numpy as np
+from Utils import Kernels
+
+
+def trellis_tables(trellis):
+    """
+        Build the predecessor tables used by the Viterbi decoder from a trellis.
+
+        :param trellis: A rate 1/n trellis with next_state_table, output_table, number_states, n and k.
+        :return: A tuple (pred_state, pred_input, pred_output) of (number_states, 2) arrays describing, for
+                 every state, the two branches entering it. Branches are ordered by previous state, which is
+                 the order commpy compares them in, so ties are broken the same way.
+        :raises ValueError: If the trellis does not have exactly one input bit per step.
+    """
+    if trellis.k != 1:
+        raise ValueError("Only rate 1/n codes (k = 1) are supported.")
+    next_state_table = np.asarray(trellis.next_state_table)
+    output_table = np.asarray(trellis.output_table)
+    number_states = trellis.number_states
+
+    pred_state = np.empty((number_states, 2), dtype=np.intp)
+    pred_input = np.empty((number_states, 2), dtype=np.uint8)
+    pred_output = np.empty((number_states, 2), dtype=np.intp)
+    for state in range(number_states):
+        previous_states, inputs = np.nonzero(next_state_table == state)
+        pred_state[state] = previous_states
+        pred_input[state] = inputs
+        pred_output[state] = output_table[previous_states, inputs]
+    return pred_state, pred_input, pred_output
+
+
+def _tables(trellis):
+    """Predecessor tables of a trellis, reusing the ones precomputed by a registered ConvolutionalCode."""
+    tables = getattr(trellis, 'tables', None)
+    return tables if tables is not None else trellis_tables(trellis)
+
+
+def _codeword_bits(n):
+    """(2**n, n) array with the bits of every codeword value, most significant bit first."""
+    values = np.arange(2 ** n)
+    return ((values[:, None] >> np.arange(n - 1, -1, -1)) & 1).astype(np.uint8)
+
+
+def _padding_symbol(n, decoding_type):
+    """Received symbol fed to the decoder after the end of the stream (the flushing steps)."""
+    if decoding_type in ('hard', 'soft'):
+        return np.zeros(n)
+    elif decoding_type == 'unquantized':
+        return -np.ones(n)
+    raise ValueError('The available decoding types are "hard", "soft" and "unquantized"')
+
+
+def branch_metrics(received, n, decoding_type):
+    """
+        Compute the metric of every codeword for every received symbol.
+
+        :param received: A (T, F, n) array of received symbols (bits, LLRs or real values) of F frames.
+        :param n: Number of coded bits per step.
+        :param decoding_type: 'hard', 'soft' (LLRs, log P(1)/P(0)) or 'unquantized' (BPSK values, 0 -> -1).
+        :return: A (T, 2**n, F) float array, the metric of codeword c at step t of frame f.
+    """
+    codeword_bits = _codeword_bits(n)
+    if decoding_type == 'hard':
+        # Only 2**n different received symbols exist, so tabulate their Hamming distances once
+        symbols = received.astype(int) @ (1 << np.arange(n - 1, -1, -1))
+        distances = np.bitwise_xor(codeword_bits[:, None, :], codeword_bits[None, :, :]).sum(axis=2)
+        return np.ascontiguousarray(distances[symbols].transpose(0, 2, 1), dtype=float)
+
+    metrics = np.zeros((received.shape[0], codeword_bits.shape[0], received.shape[1]))
+    if decoding_type == 'soft':
+        received = received.clip(-500, 500)
+        neg_ll_0 = np.log(np.exp(received) + 1)  # negative log-likelihood to have received a 0
+        neg_ll_1 = neg_ll_0 - received  # negative log-likelihood to have received a 1
+        for j in range(n):
+            metrics += np.where(codeword_bits[:, j, None], neg_ll_1[:, None, :, j], neg_ll_0[:, None, :, j])
+    elif decoding_type == 'unquantized':
+        ideal = 2.0 * codeword_bits - 1
+        for j in range(n):
+            difference = received[:, None, :, j] - ideal[:, j, None]
+            metrics += difference * difference
+    else:
+        raise ValueError('The available decoding types are "hard", "soft" and "unquantized"')
+    return metrics
+
+
+def _first_argmin(metrics):
+    """Index of the first minimum along axis 1 of (T, S, F) metrics (argmin is slow along such a short axis)."""
+    best = np.zeros((metrics.shape[0], metrics.shape[2]), dtype=np.intp)
+    current = metrics[:, 0].copy()
+    for state in range(1, metrics.shape[1]):
+        better = metrics[:, state] < current
+        best[better] = state
+        np.minimum(current, metrics[:, state], out=current)
+    return best
+
+
+def acs_forward(received, tables, n, decoding_type, path_metrics, block_bytes=1 << 24):
+    """
+        Run the add-compare-select recursion over all states of all frames for every step.
+
+        Branch metrics, decisions and path metrics are produced block by block, so the temporary memory stays
+        bounded; only the packed decisions and the best state of every step are kept.
+
+        :param received: (T, F, n) array of received symbols.
+        :param tables: Predecessor tables from trellis_tables.
+        :param n: Number of coded bits per step.
+        :param decoding_type: 'hard', 'soft' or 'unquantized'.
+        :param path_metrics: (number_states, F) path metrics before the first step.
+        :param block_bytes: Approximate size of the temporary per-block buffers.
+        :return: A tuple:
+                - survivors: (T, ceil(number_states / 8), F) uint8 array, bit s tells which of the two
+                  branches entering state s survived.
+                - best: (T, F) array with the state of minimum path metric after every step.
+                - path_metrics: Path metrics after the last step.
+    """
+    pred_state, _, pred_output = tables
+    steps, frames = received.shape[:2]
+    number_states = pred_state.shape[0]
+    step_bytes = frames * (9 * number_states + 8 * 2 ** n)
+    block_size = max(1, min(steps, block_bytes // step_bytes))
+
+    # Branches entering the states, as (2, number_states) index arrays
+    entering_states = np.ascontiguousarray(pred_state.T)
+    entering_outputs = np.ascontiguousarray(pred_output.T)
+
+    survivors = np.empty((steps, (number_states + 7) // 8, frames), dtype=np.uint8)
+    best = np.empty((steps, frames), dtype=np.intp)
+    decisions = np.empty((block_size, number_states, frames), dtype=bool)
+    metrics = np.empty((block_size, number_states, frames))
+    path_metrics = np.array(path_metrics, dtype=float)
+    for block_start in range(0, steps, block_size):
+        block_end = min(block_start + block_size, steps)
+        block_metrics = branch_metrics(received[block_start:block_end], n, decoding_type)
+        path_metrics = Kernels.acs_block(path_metrics, block_metrics, entering_states, entering_outputs,
+                                         decisions, metrics)
+        used = block_end - block_start
+        survivors[block_start:block_end] = np.packbits(decisions[:used], axis=1, bitorder='little')
+        best[block_start:block_end] = _first_argmin(metrics[:used])
+        path_metrics = path_metrics.copy()
+    return survivors, best, path_metrics
+
+
+def _survivor_bits(survivors, t, frames, states):
+    """Surviving branch (0 or 1) of the given states of the given frames at steps t."""
+    _, groups, number_frames = survivors.shape
+    index = (t * groups + (states >> 3)) * number_frames + frames
+    return (survivors.reshape(-1).take(index) >> (states & 7)) & 1
+
+
+def traceback(survivors, best, tables, first, last, end, depth, chunk_bits=1 << 20):
+    """
+        Trace back the surviving paths and return the decided bits of steps first..last-1 (0-based) of every frame.
+
+        The bit of step i is decided by the path ending in the best state of step min(i + depth, end).
+        Bits whose path starts depth steps later are traced back all at once, vectorized over bits and
+        frames; the few bits near the end share the single path of their frame starting at step end.
+
+        :param survivors: Survivor array from acs_forward.
+        :param best: Best states from acs_forward.
+        :param tables: Predecessor tables from trellis_tables.
+        :param first: First step to decide.
+        :param last: One past the last step to decide.
+        :param end: Last available step, no path starts beyond it.
+        :param depth: Number of steps traced through after the decided step.
+        :param chunk_bits: Number of bits traced back together, bounds the temporary memory.
+        :return: (F, last - first) uint8 array of decided bits.
+    """
+    pred_state, pred_input, _ = tables
+    # Flat tables: the branch b entering state s is entry 2 * s + b
+    pred_state = pred_state.ravel()
+    pred_input = pred_input.ravel()
+    number_frames = best.shape[1]
+    frames = np.arange(number_frames)
+    decoded = np.empty((number_frames, max(last - first, 0)), dtype=np.uint8)
+    split = max(first, min(last, end - depth + 1))
+
+    chunk_size = max(1, chunk_bits // number_frames)
+    for chunk_first in range(first, split, chunk_size):
+        steps = np.arange(chunk_first, min(chunk_first + chunk_size, split))[:, None]
+        states = best[steps + depth, frames]
+        for offset in range(depth, 0, -1):
+            states = pred_state.take(2 * states + _survivor_bits(survivors, steps + offset, frames, states))
+        decided = pred_input.take(2 * states + _survivor_bits(survivors, steps, frames, states))
+        decoded[:, chunk_first - first:chunk_first - first + steps.shape[0]] = decided.T
+
+    if split < last:
+        states = best[end]
+        for t in range(end, split - 1, -1):
+            branches = 2 * states + _survivor_bits(survivors, t, frames, states)
+            if t < last:
+                decoded[:, t - first] = pred_input.take(branches)
+            states = pred_state.take(branches)
+    return decoded
+
+
+def viterbi_decode_batch(coded_frames, trellis, tb_depth, decoding_type='hard'):
+    """
+        Decode many independent, equally long encoded frames in one vectorized pass.
+
+        The trellis recursion runs once over the steps of a frame, with all frames handled together by every
+        add-compare-select, so the Python-level cost does not grow with the number of frames.
+        Every frame is decoded exactly as viterbi_decode would decode it on its own.
+
+        :param coded_frames: (F, L) array of received frames (bits, LLRs or real values).
+        :param trellis: Trellis of a rate 1/n code.
+        :param tb_depth: Traceback depth (at least 2).
+        :param decoding_type: 'hard', 'soft' or 'unquantized'.
+        :return: (F, L // n) uint8 array of decoded bits.
+        :raises ValueError: If tb_depth is smaller than 2 or the frames are not a 2D array.
+    """
+    if tb_depth < 2:
+        raise ValueError("Traceback depth must be at least 2.")
+    coded_frames = np.asarray(coded_frames)
+    if coded_frames.ndim != 2:
+        raise ValueError("Frames must be an (F, L) array.")
+    tables = _tables(trellis)
+    n = trellis.n
+    padding = _padding_symbol(n, decoding_type)
+
+    number_frames = coded_frames.shape[0]
+    length = coded_frames.shape[1] // n
+    steps = length + trellis.total_memory - 1
+    if number_frames == 0 or length == 0 or steps <= 0:
+        return np.zeros((number_frames, length), dtype=np.uint8)
+
+    dtype = coded_frames.dtype if decoding_type == 'hard' else float
+    received = np.empty((steps, number_frames, n), dtype=dtype)
+    received[:length] = coded_frames[:, :length * n].reshape(number_frames, length, n).transpose(1, 0, 2)
+    received[length:] = padding
+
+    path_metrics = np.full((trellis.number_states, number_frames), np.inf)
+    path_metrics[0] = 0
+    survivors, best, _ = acs_forward(received, tables, n, decoding_type, path_metrics)
+    return traceback(survivors, best, tables, 0, length, steps - 1, tb_depth - 2)
+
+
+def viterbi_decode(coded_bits, trellis, tb_depth, decoding_type='hard'):
+    """
+        Decode a stream of convolutionally encoded bits with a vectorized Viterbi algorithm.
+
+        The result is bit-exact with commpy.channelcoding.viterbi_decode for the same tb_depth: every bit is
+        decided by tracing back tb_depth - 2 steps from the best state (fewer at the end of the stream), and
+        the stream is flushed with total_memory - 1 padding steps.
+
+        :param coded_bits: Received stream (1D array of bits, LLRs or real values).
+        :param trellis: Trellis of a rate 1/n code.
+        :param tb_depth: Traceback depth (at least 2).
+        :param decoding_type: 'hard', 'soft' or 'unquantized'.
+        :return: Decoded bits as a uint8 array of length len(coded_bits) // n.
+        :raises ValueError: If tb_depth is smaller than 2.
+    """
+    return viterbi_decode_batch(np.asarray(coded_bits).reshape(1, -1), trellis, tb_depth, decoding_type)[0]
+
+
+class StreamingViterbiDecoder:
+    def __init__(self, trellis, tb_depth, decoding_type='hard'):
+        """
+            Sliding-window Viterbi decoder for streams that do not fit in memory.
+
+            Received bits are pushed in chunks of any size; a decoded bit is emitted as soon as the step
+            tb_depth - 2 steps after it has been processed. Only the survivors of those last steps are kept
+            between chunks, so memory stays O(number_states * tb_depth) however long the stream is.
+            The output is identical to viterbi_decode on the whole stream.
+
+            :param trellis: Trellis of a rate 1/n code.
+            :param tb_depth: Traceback depth (at least 2).
+            :param decoding_type: 'hard', 'soft' or 'unquantized'.
+            :raises ValueError: If tb_depth is smaller than 2.
+        """
+        if tb_depth < 2:
+            raise ValueError("Traceback depth must be at least 2.")
+        self.trellis = trellis
+        self.tables = _tables(trellis)
+        self.n = trellis.n
+        self.depth = tb_depth - 2
+        self.decoding_type = decoding_type
+        self.padding = _padding_symbol(self.n, decoding_type)
+        self.reset()
+
+    def reset(self):
+        """Forget the current stream and start decoding a new one."""
+        self.path_metrics = np.full((self.trellis.number_states, 1), np.inf)
+        self.path_metrics[0] = 0
+        # Received values of an incomplete step
+        self.pending = np.zeros(0, dtype=np.uint8 if self.decoding_type == 'hard' else float)
+        self.steps = 0  # number of steps processed so far
+        self.next_bit = 0  # first step whose bit has not been emitted yet
+        # Survivors and best states of the steps from next_bit on
+        self.survivors = np.zeros((0, (self.trellis.number_states + 7) // 8, 1), dtype=np.uint8)
+        self.best = np.zeros((0, 1), dtype=np.intp)
+
+    def __process(self, received):
+        survivors, best, self.path_metrics = acs_forward(received.reshape(-1, 1, self.n), self.tables, self.n,
+                                                         self.decoding_type, self.path_metrics)
+        self.survivors = np.concatenate([self.survivors, survivors])
+        self.best = np.concatenate([self.best, best])
+        self.steps += received.shape[0]
+
+    def __emit(self, last, end):
+        """Decide the bits of steps next_bit..last-1, tracing back from no later than step end."""
+        offset = self.steps - self.best.shape[0]
+        decoded = traceback(self.survivors, self.best, self.tables, self.next_bit - offset, last - offset,
+                            end - offset, self.depth)[0]
+        self.next_bit = max(self.next_bit, last)
+        self.survivors = self.survivors[self.next_bit - offset:]
+        self.best = self.best[self.next_bit - offset:]
+        return decoded
+
+    def push(self, chunk):
+        """
+            Feed the next chunk of the received stream.
+            :param chunk: 1D array of received bits, LLRs or real values (any length).
+            :return: uint8 array of the bits that could be decided so far (possibly empty).
+        """
+        received = np.concatenate([self.pending, np.asarray(chunk).ravel()])
+        complete = received.size - received.size % self.n
+        self.pending = received[complete:]
+        if complete:
+            self.__process(received[:complete].reshape(-1, self.n))
+        return self.__emit(max(self.next_bit, self.steps - self.depth), self.steps - 1)
+
+    def flush(self):
+        """
+            End the stream: run the flushing steps and decide all remaining bits.
+            :return: uint8 array of the remaining decoded bits.
+        """
+        length = self.steps
+        padding_steps = self.trellis.total_memory - 1
+        if length == 0:
+            return np.zeros(0, dtype=np.uint8)
+        if padding_steps > 0:
+            self.__process(np.tile(self.padding, (padding_steps, 1)))
+        decoded = self.__emit(length, self.steps - 1)
+        self.reset()
+        return decoded
+
+    def decode_stream(self, chunks):
+        """
+            Decode a stream given as an iterable of chunks (e.g. a generator reading a file).
+            :param chunks: Iterable of 1D arrays of received values.
+            :return: Generator of uint8 arrays of decoded bits; the last one comes from flush.
+        """
+        for chunk in chunks:
+            decoded = self.push(chunk)
+            if decoded.size:
+                yield decoded
+        yield self.flush()
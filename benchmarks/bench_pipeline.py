@@ -0,0 +1,264 @@
+"""
+Throughput benchmark of every stage of the encode -> channel -> decode pipeline.
+
+    python -m benchmarks.bench_pipeline                          # all stages, all sizes
+    python -m benchmarks.bench_pipeline --sizes short message    # skip the 720 KB image
+    python -m benchmarks.bench_pipeline --output bench.json --baseline baseline.json
+
+Every stage runs on fixed-seed inputs and reports its throughput in Mbit/s of stage input and its peak traced
+memory. The cold start of the console prototype and of the worker processes is timed in fresh interpreters.
+Results are saved as JSON and can be compared with a stored baseline to flag slowdowns.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from Utils import Kernels
+from Utils.AWGN import awgn_llr
+from Utils.BSC import bsc_transmit
+from Utils.GilbertElliot import GilbertElliottChannel
+from Utils.Hamming import Hamming
+from Utils.Convolutional import ConvolutionalCoder
+from Utils.ReedSolomon import ReedSolomon
+from desktop.ImageProcessingFunctions import encode_image_bytes_hamming, decode_image_bytes_hamming
+
+SEED = 2024
+BER = 0.01
+GILBERT_ELLIOTT_PARAMS = (0.01, 0.2, 0.001, 0.3)
+TB_DEPTH = 10
+EBN0_DB = 4.0
+RS_BER = 0.002  # about 4 byte errors per RS(255, 223) codeword, all of them correctable
+
+LOREM_IPSUM = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et "
+               "dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip "
+               "ex ea commodo consequat. Duis aute irure dolor in")[:245]
+
+
+def load_payload(size):
+    """Payload bytes of a benchmark size: 'short' text, the 245-character 'message' or the bundled 'image'."""
+    if size == 'short':
+        return np.frombuffer(b"Hello, world!", dtype=np.uint8)
+    elif size == 'message':
+        return np.frombuffer(LOREM_IPSUM.encode('ascii'), dtype=np.uint8)
+    elif size == 'image':
+        from PIL import Image
+        return np.array(Image.open(os.path.join(ROOT, 'image.bmp')).convert('RGB')).ravel()
+    raise ValueError(f"Unknown size {size!r}")
+
+
+SIZES = ('short', 'message', 'image')
+STAGES = {}
+
+
+def stage(name):
+    """Register a stage; the function prepares its inputs and returns (callable, number of input bits)."""
+    def register(prepare):
+        STAGES[name] = prepare
+        return prepare
+    return register
+
+
+def _noisy(bits, rng):
+    return bsc_transmit(bits, BER, rng)[0]
+
+
+@stage('hamming_encode')
+def _hamming_encode(payload, rng):
+    bits = np.unpackbits(payload)
+    return (lambda: Hamming.CodeDataHammingObraz(bits)), bits.size
+
+
+@stage('hamming_decode')
+def _hamming_decode(payload, rng):
+    received = _noisy(Hamming.CodeDataHammingObraz(np.unpackbits(payload)), rng)
+    return (lambda: Hamming.DecodeInputDataHammingObraz(received)), received.size
+
+
+@stage('hamming_packed_encode')
+def _hamming_packed_encode(payload, rng):
+    return (lambda: encode_image_bytes_hamming(payload)), payload.size * 8
+
+
+@stage('hamming_packed_decode')
+def _hamming_packed_decode(payload, rng):
+    received = encode_image_bytes_hamming(payload)
+    return (lambda: decode_image_bytes_hamming(received, -1)), received.size * 7
+
+
+@stage('convolutional_encode')
+def _convolutional_encode(payload, rng):
+    bits = np.unpackbits(payload)
+    return (lambda: ConvolutionalCoder.CodeData(bits, True)), bits.size
+
+
+@stage('viterbi_decode')
+def _viterbi_decode(payload, rng):
+    received = _noisy(np.array(ConvolutionalCoder.CodeData(np.unpackbits(payload), True), dtype=np.uint8), rng)
+    return (lambda: ConvolutionalCoder.Decode(received, TB_DEPTH, False, True)), received.size
+
+
+@stage('reed_solomon_encode')
+def _reed_solomon_encode(payload, rng):
+    return (lambda: ReedSolomon.Encode(payload)), payload.size * 8
+
+
+@stage('reed_solomon_decode')
+def _reed_solomon_decode(payload, rng):
+    codewords = ReedSolomon.Encode(payload)
+    received = np.packbits(bsc_transmit(np.unpackbits(codewords), RS_BER, rng)[0])
+    return (lambda: ReedSolomon.Decode(received)), received.size * 8
+
+
+@stage('bsc')
+def _bsc(payload, rng):
+    bits = Hamming.CodeDataHammingObraz(np.unpackbits(payload))
+    return (lambda: bsc_transmit(bits, BER, rng)), bits.size
+
+
+@stage('gilbert_elliott')
+def _gilbert_elliott(payload, rng):
+    bits = Hamming.CodeDataHammingObraz(np.unpackbits(payload))
+    channel = GilbertElliottChannel(*GILBERT_ELLIOTT_PARAMS, seed=rng)
+    return (lambda: channel.transmit(bits)), bits.size
+
+
+@stage('awgn')
+def _awgn(payload, rng):
+    bits = Hamming.CodeDataHammingObraz(np.unpackbits(payload))
+    return (lambda: awgn_llr(bits, EBN0_DB, 4 / 7, rng=rng)), bits.size
+
+
+# Statements timed in a fresh interpreter: the bare interpreter, the console prototype, the module an image
+# pipeline worker imports to run a strip and the one a sweep worker imports to run trials
+STARTUP_STATEMENTS = {
+    'interpreter': 'pass',
+    'main': 'import main',
+    'image_worker': 'import desktop.ImagePipeline',
+    'sweep_worker': 'import Utils.Sweep',
+}
+
+
+def measure_startup(statement, repeat):
+    """Best wall time of starting an interpreter in the repository root and running a statement."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], cwd=ROOT, check=True)
+        best = min(best, time.perf_counter() - start)
+    return {'seconds': best}
+
+
+def run_startup(repeat=3, report=print):
+    results = {}
+    for name, statement in STARTUP_STATEMENTS.items():
+        result = measure_startup(statement, repeat)
+        results[f"startup/{name}"] = result
+        report(f"{'startup':>24} {name:>12}: {result['seconds'] * 1e3:10.2f} ms")
+    return results
+
+
+def measure(run, bits, repeat, min_time=0.2):
+    """Best wall time of a stage over several runs (short stages are looped) and its peak traced memory."""
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = float('inf')
+    for _ in range(repeat):
+        loops, elapsed = 0, 0.0
+        start = time.perf_counter()
+        while elapsed < min_time or loops == 0:
+            run()
+            loops += 1
+            elapsed = time.perf_counter() - start
+            if elapsed > min_time * 10:
+                break
+        best = min(best, elapsed / loops)
+    return {'bits': int(bits), 'seconds': best, 'mbit_s': bits / best / 1e6, 'peak_mb': peak / 2 ** 20}
+
+
+def run_benchmarks(stages, sizes, repeat=3, report=print):
+    results = {}
+    for size in sizes:
+        payload = load_payload(size)
+        for name in stages:
+            # The coders print progress information, which must not end up in the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                run, bits = STAGES[name](payload, np.random.default_rng(SEED))
+                result = measure(run, bits, repeat)
+            results[f"{name}/{size}"] = result
+            report(f"{name:>24} {size:>8}: {result['mbit_s']:10.3f} Mbit/s  {result['seconds'] * 1e3:10.2f} ms  "
+                   f"peak {result['peak_mb']:8.2f} MB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the benchmarks that got slower than the baseline by more than tolerance (a fraction)."""
+    slower = {}
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if 'mbit_s' in result:
+            ratio = result['mbit_s'] / reference['mbit_s']
+        else:
+            ratio = reference['seconds'] / result['seconds']
+        if ratio < 1 - tolerance:
+            slower[key] = ratio
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the encode -> channel -> decode pipeline.")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--sizes', nargs='+', choices=SIZES, default=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="JSON file for the results")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="allowed slowdown before flagging (fraction)")
+    parser.add_argument('--skip-startup', action='store_true', help="do not time the interpreter cold starts")
+    args = parser.parse_args(argv)
+
+    results = {} if args.skip_startup else run_startup(args.repeat)
+    results.update(run_benchmarks(args.stages, args.sizes, args.repeat))
+    document = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'kernels': Kernels.BACKEND,
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(document, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        slower = compare(results, baseline, args.tolerance)
+        for key, ratio in sorted(slower.items()):
+            print(f"SLOWER: {key} runs at {ratio:.2f}x of the baseline speed")
+        if slower:
+            sys.exit(1)
+        print("No slowdowns against the baseline.")
+
+
+if __name__ == '__main__':
+    main()
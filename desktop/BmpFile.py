@@ -0,0 +1,75 @@
+import struct
+
+import numpy as np
+
+FILE_HEADER = struct.Struct('<2sIHHI')  # signature, file size, 2 reserved, offset of the pixel data
+INFO_HEADER = struct.Struct('<IiiHHIIiiII')  # BITMAPINFOHEADER
+BI_RGB = 0
+
+
+def _row_bytes(width, bits_per_pixel):
+    """Rows of BMP pixel data are padded to a multiple of 4 bytes."""
+    return (width * bits_per_pixel // 8 + 3) // 4 * 4
+
+
+def _pixel_view(raw, height, width, channels, bottom_up):
+    """Top-down RGB view (no copy) of memory-mapped BGR(A) rows."""
+    pixels = raw[:, :width * channels].reshape(height, width, channels)[:, :, 2::-1]
+    return pixels[::-1] if bottom_up else pixels
+
+
+def read_bmp(path, mode='r'):
+    """
+    Memory-map the pixels of an uncompressed 24 or 32-bit BMP file.
+
+    Nothing is read until rows of the returned array are accessed, so images much larger than the memory
+    can be processed strip by strip.
+
+    :param path: BMP file.
+    :param mode: 'r' for read-only access, 'r+' to modify the file in place.
+    :return: An (H, W, 3) uint8 RGB view of the pixel data, rows top-down, backed by the file.
+    :raises ValueError: If the file is not an uncompressed 24 or 32-bit BMP.
+    """
+    with open(path, 'rb') as file:
+        header = file.read(FILE_HEADER.size + INFO_HEADER.size)
+    if len(header) < FILE_HEADER.size + INFO_HEADER.size:
+        raise ValueError("File is too short to be a BMP image.")
+    signature, _, _, _, offset = FILE_HEADER.unpack_from(header)
+    _, width, height, _, bits_per_pixel, compression, *_ = INFO_HEADER.unpack_from(header, FILE_HEADER.size)
+    if signature != b'BM':
+        raise ValueError("Not a BMP file.")
+    if compression != BI_RGB or bits_per_pixel not in (24, 32):
+        raise ValueError("Only uncompressed 24 and 32-bit BMP files can be memory-mapped.")
+    raw = np.memmap(path, dtype=np.uint8, mode=mode, offset=offset,
+                    shape=(abs(height), _row_bytes(width, bits_per_pixel)))
+    return _pixel_view(raw, abs(height), width, bits_per_pixel // 8, height > 0)
+
+
+def create_bmp(path, height, width):
+    """
+    Create a 24-bit BMP file of the given size and memory-map its pixels for writing.
+
+    Strips written into the returned array go straight to the file (call flush_bmp or drop the array
+    to make sure they reach the disk), so the image never has to be held in memory as a whole.
+
+    :param path: BMP file to create (overwritten if it exists).
+    :param height: Number of rows.
+    :param width: Number of columns.
+    :return: An (H, W, 3) uint8 RGB view of the pixel data, rows top-down, backed by the file.
+    """
+    row_bytes = _row_bytes(width, 24)
+    offset = FILE_HEADER.size + INFO_HEADER.size
+    size = offset + row_bytes * height
+    with open(path, 'wb') as file:
+        file.write(FILE_HEADER.pack(b'BM', size, 0, 0, offset))
+        file.write(INFO_HEADER.pack(INFO_HEADER.size, width, height, 1, 24, BI_RGB, row_bytes * height,
+                                    2835, 2835, 0, 0))
+        file.truncate(size)
+    raw = np.memmap(path, dtype=np.uint8, mode='r+', offset=offset, shape=(height, row_bytes))
+    return _pixel_view(raw, height, width, 3, True)
+
+
+def flush_bmp(pixels):
+    """Write the modified pages of a memory-mapped BMP view to its file."""
+    if isinstance(pixels, np.memmap):
+        pixels.flush()
@@ -0,0 +1,233 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from desktop.BmpFile import read_bmp, create_bmp, flush_bmp
+from desktop.ImageProcessingFunctions import encode_image_part, transmit_data, decode_image_part, noisy_image_part
+
+# More strips than workers, so that a slow strip does not leave the other workers idle at the end
+STRIPS_PER_WORKER = 2
+# Stage of every strip, written by the workers into a shared status array
+STAGES = ('queued', 'encoding', 'transmitting', 'decoding', 'done')
+# Seconds between two progress reports
+PROGRESS_INTERVAL = 0.1
+# Bytes of a BMP file loaded into shared memory at once by run_bmp
+CHUNK_BYTES = 1 << 26
+
+
+def strip_bounds(height, strips):
+    """Row ranges (start, stop) of strips of almost equal height covering all rows of an image."""
+    edges = np.linspace(0, height, min(strips, height) + 1).round().astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:])]
+
+
+def _release(blocks):
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            # Views are still referenced by a traceback, the mapping goes away with them
+            pass
+
+
+def _run_strip(source, noisy, decoded, status, index, start, stop, coding_type, channel_model, channel_params,
+               tb_depth, seed, interleaver=None):
+    part = source[start:stop]
+    status[index] = STAGES.index('encoding')
+    encoded_data = encode_image_part(part, coding_type)
+    status[index] = STAGES.index('transmitting')
+    transmitted_data, _ = transmit_data(encoded_data, channel_model, channel_params, coding_type,
+                                        np.random.default_rng(seed), interleaver)
+    noisy[start:stop] = noisy_image_part(transmitted_data, coding_type, part.shape)
+    status[index] = STAGES.index('decoding')
+    decoded[start:stop] = decode_image_part((transmitted_data, coding_type, tb_depth, part.shape))
+    status[index] = STAGES.index('done')
+
+
+def _bootstrap_worker(coding_type):
+    """
+    Pool initializer: import the coder of the run that started the pool and build its tables by coding one
+    pixel, so the first strip of every worker does not wait for them. Other coders are imported on first use.
+    """
+    pixel = np.zeros((1, 1, 3), dtype=np.uint8)
+    decode_image_part((encode_image_part(pixel, coding_type), coding_type, 3, pixel.shape))
+
+
+def _process_strip(names, shape, strips, index, start, stop, coding_type, channel_model, channel_params, tb_depth,
+                   seed, interleaver=None):
+    """
+    Worker task: encode, transmit and decode rows start:stop of the shared input image, write the noisy and
+    decoded rows into the shared output images and the current stage into the shared status array.
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    images = (np.ndarray(shape, dtype=np.uint8, buffer=block.buf) for block in blocks[:3])
+    try:
+        _run_strip(*images, np.ndarray(strips, dtype=np.uint8, buffer=blocks[3].buf), index, start, stop,
+                   coding_type, channel_model, channel_params, tb_depth, seed, interleaver)
+    finally:
+        del images
+        _release(blocks)
+    return start, stop
+
+
+class ImagePipeline:
+    def __init__(self, workers=None):
+        """
+            Persistent pool of worker processes running the encode -> channel -> decode pipeline on image strips.
+
+            The image and both result images live in shared memory, so a worker only receives the row range of
+            its strip and writes its results in place; nothing but the strip bounds is pickled. The pool is
+            started on the first run and reused until shutdown().
+
+            :param workers: Number of worker processes (default: all cores).
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def terminate(self):
+        """
+            Kill the worker processes at once, abandoning the strips they are working on (the running
+            run_strips then fails with BrokenProcessPool). The next run starts a new pool.
+        """
+        executor, self.executor = self.executor, None
+        if executor is None:
+            return
+        if hasattr(executor, 'terminate_workers'):
+            executor.terminate_workers()
+        else:
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run_strips(self, image, coding_type, channel_model, channel_params, tb_depth=3, seed=None, strips=None,
+                   progress=None, interleaver=None):
+        """
+            Run the pipeline on an image, yielding as soon as each strip is finished.
+
+            :param image: (H, W, 3) uint8 image.
+            :param coding_type: 1 - Hamming, 2 - Convolutional, 3 - Hamming (packed), 4 - Reed-Solomon,
+                                5 - Reed-Solomon + Convolutional.
+            :param channel_model: 1 - BSC, 2 - Gilbert-Elliott.
+            :param channel_params: BER of the BSC or the 4 Gilbert-Elliott parameters.
+            :param tb_depth: Traceback depth of the Viterbi decoder.
+            :param seed: Root seed or SeedSequence; every strip gets its own independent random stream.
+            :param strips: Number of strips (default: STRIPS_PER_WORKER per worker).
+            :param progress: Optional callback called with a dictionary {stage: number of strips} (see STAGES)
+                             whenever a strip moves on to its next stage.
+            :param interleaver: Optional Interleaver applied to every encoded strip before the channel.
+            :return: Generator of (start, stop, noisy, decoded): the row range of a finished strip with its
+                     received (undecoded) and decoded rows, in order of completion.
+        """
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        bounds = strip_bounds(image.shape[0], strips or self.workers * STRIPS_PER_WORKER)
+        seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        seeds = seed_sequence.spawn(len(bounds))
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_bootstrap_worker,
+                                                initargs=(coding_type,))
+
+        blocks = [shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1)) for _ in range(3)]
+        blocks.append(shared_memory.SharedMemory(create=True, size=len(bounds)))
+        images = [np.ndarray(image.shape, dtype=np.uint8, buffer=block.buf) for block in blocks[:3]]
+        status = np.ndarray(len(bounds), dtype=np.uint8, buffer=blocks[3].buf)
+        futures = []
+        try:
+            images[0][:] = image
+            status[:] = STAGES.index('queued')
+            names = [block.name for block in blocks]
+            futures = [self.executor.submit(_process_strip, names, image.shape, len(bounds), index, start, stop,
+                                            coding_type, channel_model, channel_params, tb_depth, strip_seed,
+                                            interleaver)
+                       for index, ((start, stop), strip_seed) in enumerate(zip(bounds, seeds))]
+            pending, reported = set(futures), None
+            while pending:
+                finished, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                counts = np.bincount(status, minlength=len(STAGES)).tolist()
+                if progress is not None and counts != reported:
+                    progress(dict(zip(STAGES, counts)))
+                    reported = counts
+                for future in finished:
+                    start, stop = future.result()
+                    yield start, stop, images[1][start:stop].copy(), images[2][start:stop].copy()
+        finally:
+            for future in futures:
+                future.cancel()
+            # A worker may still be writing a strip of an abandoned run, wait for it before unlinking
+            for future in futures:
+                if not future.cancelled():
+                    future.exception()
+            del images, status
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def run(self, image, coding_type, channel_model, channel_params, tb_depth=3, seed=None, strips=None,
+            interleaver=None):
+        """
+            Run the pipeline on a whole image (see run_strips).
+            :return: A tuple (noisy, decoded) of images with the shape of image.
+        """
+        noisy, decoded = np.empty_like(image), np.empty_like(image)
+        for start, stop, noisy_rows, decoded_rows in self.run_strips(image, coding_type, channel_model,
+                                                                     channel_params, tb_depth, seed, strips,
+                                                                     interleaver=interleaver):
+            noisy[start:stop] = noisy_rows
+            decoded[start:stop] = decoded_rows
+        return noisy, decoded
+
+    def run_bmp(self, input_path, output_path, coding_type, channel_model, channel_params, tb_depth=3, seed=None,
+                noisy_path=None, chunk_bytes=CHUNK_BYTES, progress=None, interleaver=None):
+        """
+            Run the pipeline on a BMP file of any size, chunk by chunk, writing the decoded image (and optionally
+            the received, undecoded one) incrementally into memory-mapped BMP files.
+
+            Only one chunk of about chunk_bytes bytes is held in shared memory at a time; it is split into strips
+            for the workers like an image passed to run_strips.
+
+            :param input_path: Uncompressed 24 or 32-bit BMP file.
+            :param output_path: 24-bit BMP file for the decoded image.
+            :param coding_type: 1 - Hamming, 2 - Convolutional, 3 - Hamming (packed), 4 - Reed-Solomon,
+                                5 - Reed-Solomon + Convolutional.
+            :param channel_model: 1 - BSC, 2 - Gilbert-Elliott.
+            :param channel_params: BER of the BSC or the 4 Gilbert-Elliott parameters.
+            :param tb_depth: Traceback depth of the Viterbi decoder.
+            :param seed: Root seed; every chunk and strip gets its own independent random stream.
+            :param noisy_path: Optional 24-bit BMP file for the received image.
+            :param chunk_bytes: Approximate number of image bytes processed at once.
+            :param progress: Optional callback called with (rows done, total rows) after every chunk.
+            :param interleaver: Optional Interleaver applied to every encoded strip before the channel.
+            :raises ValueError: If the input is not an uncompressed 24 or 32-bit BMP.
+        """
+        source = read_bmp(input_path)
+        height, width, _ = source.shape
+        decoded = create_bmp(output_path, height, width)
+        noisy = create_bmp(noisy_path, height, width) if noisy_path else None
+        chunk_rows = max(1, chunk_bytes // max(width * 3, 1))
+        seed_sequence = np.random.SeedSequence(seed)
+        for first in range(0, height, chunk_rows):
+            last = min(first + chunk_rows, height)
+            for start, stop, noisy_rows, decoded_rows in self.run_strips(source[first:last], coding_type,
+                                                                         channel_model, channel_params, tb_depth,
+                                                                         seed_sequence.spawn(1)[0],
+                                                                         interleaver=interleaver):
+                decoded[first + start:first + stop] = decoded_rows
+                if noisy is not None:
+                    noisy[first + start:first + stop] = noisy_rows
+            flush_bmp(decoded)
+            if noisy is not None:
+                flush_bmp(noisy)
+            if progress is not None:
+                progress(last, height)
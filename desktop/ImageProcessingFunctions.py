@@ -1,7 +1,78 @@
-from Utils.Hamming import *
-from Utils.Convolutional import *
-from Utils.BSC import *
-from Utils.GilbertElliot import *
+import numpy as np
+from Utils.Hamming import Hamming
+from Utils.BSC import bsc_transmit, bsc_channel_transmission_hamming, bsc_channel_transmission_splot
+from Utils.GilbertElliot import GilbertElliottChannel
+from Utils.BitBuffer import BitBuffer
+from Utils.HelperFunctions import buffer_bytes, load
+import hashlib
+import time
+
+# Coder class of every coding type but the packed Hamming mode, imported on first use, so a worker process only
+# loads (and builds the tables of) the coder it actually runs
+CODER_CLASSES = {
+    1: ('Utils.Hamming', 'Hamming'),
+    2: ('Utils.Convolutional', 'ConvolutionalCoder'),
+    4: ('Utils.ReedSolomon', 'ReedSolomon'),
+    5: ('Utils.Concatenated', 'ConcatenatedCoder'),
+}
+
+
+def coder_class(coding_type):
+    """Coder class of a coding type (see CODER_CLASSES), importing its module on first use."""
+    if coding_type not in CODER_CLASSES:
+        raise ValueError("Invalid coding type selected")
+    return load(*CODER_CLASSES[coding_type])
+
+
+def _codewords_to_bytes(codewords):
+    """Pack (N, 7) Hamming codewords into the low 7 bits of N bytes."""
+    return np.packbits(np.pad(codewords, ((0, 0), (1, 0))), axis=1).ravel()
+
+
+# Lookup tables of the packed Hamming mode: a nibble maps to a codeword byte and
+# every possible received codeword byte maps back to a corrected (or raw) nibble
+HAMMING_ENCODE_TABLE = Hamming.ENCODE_TABLE
+HAMMING_DECODE_TABLE = Hamming.DECODE_TABLE
+HAMMING_RAW_TABLE = Hamming.RAW_TABLE
+HAMMING_CORRECTION_TABLE = Hamming.CORRECTION_TABLE
+
+
+def encode_image_bytes_hamming(image):
+    """Encode image bytes into Hamming codeword bytes (high nibble first) with table lookups."""
+    data = np.ascontiguousarray(image, dtype=np.uint8).ravel()
+    codeword_bytes = np.empty(data.size * 2, dtype=np.uint8)
+    codeword_bytes[0::2] = HAMMING_ENCODE_TABLE[data >> 4]
+    codeword_bytes[1::2] = HAMMING_ENCODE_TABLE[data & 0x0F]
+    return codeword_bytes
+
+
+def decode_image_bytes_hamming(codeword_bytes, shape, correct=True):
+    """Decode Hamming codeword bytes back into image bytes; with correct=False the data bits are taken as received."""
+    table = HAMMING_DECODE_TABLE if correct else HAMMING_RAW_TABLE
+    nibbles = table[codeword_bytes & 0x7F]
+    return ((nibbles[0::2] << 4) | nibbles[1::2]).reshape(shape)
+
+
+def transmit_bsc_packed(codeword_bytes, ber, rng=None):
+    """Send Hamming codeword bytes through a BSC channel, flipping only the 7 codeword bits of each byte."""
+    _, errors = bsc_transmit(codeword_bytes, ber, rng, packed=True)
+    errors &= 0x7F
+    return codeword_bytes ^ errors, errors
+
+
+def transmit_gilbert_elliott_packed(codeword_bytes, channel):
+    """Send Hamming codeword bytes through a Gilbert-Elliott channel, 7 codeword bits per byte."""
+    _, errors = channel.transmit(np.zeros((codeword_bytes.size, 7), dtype=np.uint8))
+    errors = _codewords_to_bytes(errors)
+    return codeword_bytes ^ errors, errors
+
+
+def interleave_packed(codeword_bytes, interleaver, inverse=False):
+    """(De-)interleave the 7 codeword bits of Hamming codeword bytes across the whole array."""
+    codewords = np.unpackbits(np.asarray(codeword_bytes, dtype=np.uint8)[:, None], axis=1)[:, 1:]
+    codewords = interleaver.deinterleave(codewords) if inverse else interleaver.interleave(codewords)
+    return _codewords_to_bytes(codewords)
+
 
 def bits_to_image(bits, shape):
     """Convert bit array back to image data."""
@@ -27,44 +98,182 @@ def generate_overlay_image(input_image, output_image):
     diff = np.abs(input_image - output_image)
     return diff.astype(np.uint8)
 
-def transmit_bsc(data, ber, coding_type):
-    if coding_type == 1:  # Hamming
-        return bsc_channel_transmission_hamming(data, ber)
+def transmit_bsc(data, ber, coding_type, rng=None):
+    if isinstance(data, BitBuffer):  # Hamming or Convolutional on packed bits
+        return bsc_transmit(data, ber, rng)
+    elif coding_type == 1:  # Hamming
+        return bsc_channel_transmission_hamming(data, ber, rng)
     elif coding_type == 2:  # Convolutional
-        return bsc_channel_transmission_splot(data, ber)
+        return bsc_channel_transmission_splot(data, ber, rng)
+    elif coding_type == 3:  # Hamming (packed)
+        return transmit_bsc_packed(data, ber, rng)
     else:
         raise ValueError("Invalid coding type selected")
 
 
-def transmit_gilbert_elliott(data, channel_params, coding_type):
-    channel = GilbertElliottChannel(*channel_params)
-    if coding_type == 1:  # Hamming
+def transmit_gilbert_elliott(data, channel_params, coding_type, rng=None):
+    channel = GilbertElliottChannel(*channel_params, seed=rng)
+    if isinstance(data, BitBuffer):  # Hamming or Convolutional on packed bits
+        return channel.transmit(data)
+    elif coding_type == 1:  # Hamming
         return channel.transmitHamming(data)
     elif coding_type == 2:  # Convolutional
         return channel.transmitConvolutional(data)
+    elif coding_type == 3:  # Hamming (packed)
+        return transmit_gilbert_elliott_packed(data, channel)
     else:
         raise ValueError("Invalid coding type selected")
 
+def transmit_data(data, channel_model, channel_params, coding_type, rng=None, interleaver=None):
+    """Send encoded data through the channel; with an Interleaver the channel sees the data interleaved."""
+    if interleaver is not None:
+        if coding_type == 3:
+            data = interleave_packed(data, interleaver)
+        else:
+            data = interleaver.interleave(data)
+
+    if channel_model == 1:  # BSC
+        received, errors = transmit_bsc(data, channel_params, coding_type, rng)
+    elif channel_model == 2:  # Gilbert-Elliott
+        received, errors = transmit_gilbert_elliott(data, channel_params, coding_type, rng)
+    else:
+        raise ValueError("Invalid channel model selected")
+
+    if interleaver is not None:
+        # Received data and errors back in code order for the decoder
+        if coding_type == 3:
+            return interleave_packed(received, interleaver, True), interleave_packed(errors, interleaver, True)
+        return interleaver.deinterleave(received), interleaver.deinterleave(errors)
+    return received, errors
+
 def encode_data(data, coding_type,):
     if coding_type == 1:  # Hamming
+        if isinstance(data, BitBuffer):
+            return Hamming.EncodePacked(data)
         return Hamming.CodeDataHammingObraz(data)
     elif coding_type == 2:  # Convolutional
-        return ConvolutionalCoder.CodeData(word=data, isPicture=True)
+        if isinstance(data, BitBuffer):
+            return coder_class(2).EncodePacked(data)
+        return coder_class(2).CodeData(word=data, isPicture=True)
+    elif coding_type == 3:  # Hamming (packed), data are image bytes
+        return encode_image_bytes_hamming(data)
+    elif coding_type == 4:  # Reed-Solomon (255, 223)
+        return coder_class(4).EncodePacked(data)
+    elif coding_type == 5:  # Reed-Solomon + Convolutional
+        return coder_class(5).EncodePacked(data)
     else:
         raise ValueError("Invalid coding type selected")
 
 def decode_data(data, coding_type, tb_depth):
     if coding_type == 1:  # Hamming
+        if isinstance(data, BitBuffer):
+            return Hamming.DecodePacked(data)
         return Hamming.DecodeInputDataHammingObraz(data)
     elif coding_type == 2:  # Convolutional
-        return ConvolutionalCoder.Decode(data, tb_depth, False, True)
+        if isinstance(data, BitBuffer):
+            return coder_class(2).DecodePacked(data, tb_depth)
+        return coder_class(2).Decode(data, tb_depth, False, True)
+    elif coding_type == 3:  # Hamming (packed), returns image bytes
+        return decode_image_bytes_hamming(data, -1)
+    elif coding_type == 4:  # Reed-Solomon (255, 223)
+        return coder_class(4).DecodePacked(data)
+    elif coding_type == 5:  # Reed-Solomon + Convolutional
+        return coder_class(5).DecodePacked(data, tb_depth)
     else:
         raise ValueError("Invalid coding type selected")
 
+def encode_image_part(part, coding_type):
+    """Encode a single image part; its bytes are wrapped in a BitBuffer, the packed Hamming mode uses them directly."""
+    if coding_type == 3:
+        return encode_data(part, coding_type)
+    return encode_data(BitBuffer.from_bytes(part), coding_type)
+
 def decode_image_part(args):
     """Decode a single image part with the specified parameters."""
     encoded_data, coding_type, tb_depth, part_shape = args
+    if coding_type == 3:
+        return decode_data(encoded_data, coding_type, tb_depth).reshape(part_shape)
     decoded_bits = decode_data(encoded_data, coding_type, tb_depth)
+    if isinstance(decoded_bits, BitBuffer):
+        return buffer_bytes(decoded_bits)[:np.prod(part_shape)].reshape(part_shape)
     decoded_part = bits_to_image(decoded_bits[:np.prod(part_shape) * 8], part_shape)
     return decoded_part
 
+def noisy_image_part(transmitted_data, coding_type, part_shape):
+    """Image of the received bits before decoding: raw data bits for packed Hamming, otherwise the first received bits."""
+    if coding_type == 3:
+        return decode_image_bytes_hamming(transmitted_data, part_shape, correct=False)
+    if isinstance(transmitted_data, BitBuffer):
+        return buffer_bytes(transmitted_data)[:np.prod(part_shape)].reshape(part_shape)
+    return bits_to_image(np.asarray(transmitted_data).ravel()[:np.prod(part_shape) * 8], part_shape)
+
+def _decode_image_part_with_corrections(transmitted_data, coding_type, tb_depth, part_shape):
+    """Decode an image part and count the corrections (Hamming blocks, Reed-Solomon bytes, 0 for convolutional)."""
+    if coding_type == 1 and isinstance(transmitted_data, BitBuffer):
+        decoded_buffer, corrections = Hamming.DecodePacked(transmitted_data, returnCorrections=True)
+        return buffer_bytes(decoded_buffer).reshape(part_shape), int(corrections.sum())
+    elif coding_type == 1:
+        decoded_bits, corrections = Hamming.DecodeInputDataHammingObraz(transmitted_data, returnCorrections=True)
+        return bits_to_image(decoded_bits, part_shape), int(corrections.sum())
+    elif coding_type == 3:
+        corrections = HAMMING_CORRECTION_TABLE[np.asarray(transmitted_data) & 0x7F].sum()
+        return decode_image_part((transmitted_data, coding_type, tb_depth, part_shape)), int(corrections)
+    elif coding_type in (4, 5):  # corrected RS bytes
+        if coding_type == 4:
+            decoded_buffer, corrections, _ = coder_class(4).DecodePacked(transmitted_data, returnCorrections=True)
+        else:
+            decoded_buffer, corrections, _ = coder_class(5).DecodePacked(transmitted_data, tb_depth,
+                                                                         returnCorrections=True)
+        return buffer_bytes(decoded_buffer).reshape(part_shape), int(corrections.sum())
+    return decode_image_part((transmitted_data, coding_type, tb_depth, part_shape)), 0
+
+def image_transmission_statistics(image, coding_type, channel_model, channel_params, tb_depth=3, seed=0, parts=4,
+                                  cache=None, interleaver=None):
+    """
+    Run the encode -> transmit -> decode pipeline on an image with a seeded channel and measure the result.
+    A frame is one image row; the BER and FER are measured on the decoded image. An Interleaver permutes
+    each encoded part before the channel.
+    With a ResultCache the statistics of an already simulated (image, coder, channel, seed) point are reused.
+    """
+    spec = {
+        'image': hashlib.sha256(np.ascontiguousarray(image).tobytes()).hexdigest(),
+        'shape': list(image.shape),
+        'coding_type': coding_type,
+        'channel_model': channel_model,
+        'channel_params': list(np.atleast_1d(channel_params).tolist()),
+        'tb_depth': tb_depth if coding_type == 2 else None,
+        'seed': seed,
+        'parts': parts,
+    }
+    if interleaver is not None:
+        spec['interleaver'] = repr(interleaver)
+
+    def compute():
+        start = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        bit_errors = row_errors = rows = corrections = 0
+        for part in split_image(image, parts):
+            transmitted_data, _ = transmit_data(encode_image_part(part, coding_type), channel_model,
+                                                channel_params, coding_type, rng, interleaver)
+            decoded_part, part_corrections = _decode_image_part_with_corrections(transmitted_data, coding_type,
+                                                                                  tb_depth, part.shape)
+            wrong_bits = np.unpackbits(decoded_part ^ part).reshape(part.shape[0], -1).sum(axis=1)
+            bit_errors += int(wrong_bits.sum())
+            row_errors += int(np.count_nonzero(wrong_bits))
+            rows += part.shape[0]
+            corrections += part_corrections
+        bits = rows * image[0].size * 8
+        return {
+            'bits': bits,
+            'bit_errors': bit_errors,
+            'decoded_ber': bit_errors / max(bits, 1),
+            'frames': rows,
+            'frame_errors': row_errors,
+            'decoded_fer': row_errors / max(rows, 1),
+            'corrections': corrections,
+            'wall_time': time.perf_counter() - start,
+        }
+
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(spec, compute)
@@ -0,0 +1,67 @@
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from desktop.ImagePipeline import STAGES
+
+
+class PipelineSignals(QObject):
+    """Signals of a PipelineTask; they are delivered to the GUI thread through queued connections."""
+    progress = Signal(str, int)  # description of the stages, percentage of the work done
+    strip_finished = Signal(int, int, object, object)  # first row, end row, noisy rows, decoded rows
+    finished = Signal()
+    cancelled = Signal()
+    failed = Signal(str)
+
+
+class PipelineTask(QRunnable):
+    def __init__(self, pipeline, image, coding_type, channel_model, channel_params, tb_depth=3):
+        """
+            Runs ImagePipeline.run_strips on a QThreadPool thread so the Qt event loop stays responsive.
+
+            :param pipeline: ImagePipeline whose worker processes do the work.
+            :param image: (H, W, 3) uint8 image.
+            :param coding_type: 1 - Hamming, 2 - Convolutional, 3 - Hamming (packed), 4 - Reed-Solomon,
+                                5 - Reed-Solomon + Convolutional.
+            :param channel_model: 1 - BSC, 2 - Gilbert-Elliott.
+            :param channel_params: BER of the BSC or the 4 Gilbert-Elliott parameters.
+            :param tb_depth: Traceback depth of the Viterbi decoder.
+        """
+        super().__init__()
+        self.pipeline = pipeline
+        self.arguments = (image, coding_type, channel_model, channel_params, tb_depth)
+        self.signals = PipelineSignals()
+        self.cancel_requested = threading.Event()
+
+    def cancel(self):
+        """Stop the worker processes; the task then emits cancelled."""
+        self.cancel_requested.set()
+        self.pipeline.terminate()
+
+    def report(self, counts):
+        total = sum(counts.values())
+        description = ", ".join(f"{stage} {count}" for stage, count in counts.items() if count)
+        # Every stage a strip has passed counts as an equal share of its work
+        done = sum(STAGES.index(stage) * count for stage, count in counts.items())
+        self.signals.progress.emit(f"{description} (of {total} strips)",
+                                   int(100 * done / max(total * (len(STAGES) - 1), 1)))
+
+    def run(self):
+        try:
+            for start, stop, noisy_rows, decoded_rows in self.pipeline.run_strips(*self.arguments,
+                                                                                  progress=self.report):
+                if self.cancel_requested.is_set():
+                    break
+                self.signals.strip_finished.emit(start, stop, noisy_rows, decoded_rows)
+        except BrokenProcessPool:
+            if not self.cancel_requested.is_set():
+                self.signals.failed.emit("Worker processes stopped unexpectedly.")
+                return
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        if self.cancel_requested.is_set():
+            self.signals.cancelled.emit()
+        else:
+            self.signals.finished.emit()
@@ -1,13 +1,14 @@
 import sys
 import numpy as np
-from PIL import Image
-import multiprocessing as mp
 
+from PySide6.QtCore import QThreadPool
 from PySide6.QtGui import QPixmap, QImage
-from desktop.ImageProcessingFunctions import encode_data, image_to_bits, bits_to_image, generate_overlay_image
+from desktop.ImageProcessingFunctions import generate_overlay_image
+from desktop.ImagePipeline import ImagePipeline
+from desktop.BmpFile import read_bmp
+from desktop.PipelineTask import PipelineTask
 from PySide6.QtWidgets import (QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QGridLayout,
-                               QComboBox, QFileDialog, QLineEdit, QFormLayout)
-from desktop.ImageProcessingFunctions import split_image, transmit_bsc, transmit_gilbert_elliott, decode_image_part, merge_image
+                               QComboBox, QFileDialog, QLineEdit, QFormLayout, QProgressBar)
 from desktop.zoomable_label import ZoomableLabel
 
 
@@ -15,6 +16,9 @@ class TransmissionSimulator(QWidget):
     def __init__(self):
         super().__init__()
         self.transmit_btn = None
+        self.cancel_btn = None
+        self.progress_bar = None
+        self.progress_label = None
         self.load_btn = None
         self.param_inputs = None
         self.param_form = None
@@ -25,6 +29,11 @@ class TransmissionSimulator(QWidget):
         self.noisy_image_label = None
         self.input_image_label = None
         self.input_image = None
+        self.pipeline = ImagePipeline()
+        self.task = None
+        self.noisy_image = None
+        self.decoded_image = None
+        self.overlay_image = None
         self.initUI()
 
     def initUI(self):
@@ -68,7 +77,8 @@ class TransmissionSimulator(QWidget):
         self.channel_select.addItems(['BSC', 'Gilbert-Elliott'])
         self.channel_select.currentIndexChanged.connect(self.update_input_fields)
         self.coding_select = QComboBox()
-        self.coding_select.addItems(['Hamming', 'Convolutional'])
+        self.coding_select.addItems(['Hamming', 'Convolutional', 'Hamming (packed)', 'Reed-Solomon (255, 223)',
+                                     'Reed-Solomon + Convolutional'])
 
         select_layout.addWidget(QLabel("Select Coding Type"))
         select_layout.addWidget(self.coding_select)
@@ -89,6 +99,17 @@ class TransmissionSimulator(QWidget):
         self.transmit_btn.clicked.connect(self.transmit_and_decode)
         control_layout.addWidget(self.transmit_btn)
 
+        self.cancel_btn = QPushButton('Cancel')
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_transmission)
+        control_layout.addWidget(self.cancel_btn)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        control_layout.addWidget(self.progress_bar)
+        self.progress_label = QLabel()
+        control_layout.addWidget(self.progress_label)
+
         main_layout.addLayout(control_layout)
         self.setLayout(main_layout)
 
@@ -131,15 +152,21 @@ class TransmissionSimulator(QWidget):
             print(f"Error loading image: {e}")
 
     def load_bmp_image(self, file_path):
-        image = Image.open(file_path).convert('RGB')
-        return np.array(image)
-
-    def display_image(self, image_array, label):
+        try:
+            return read_bmp(file_path)  # Memory-mapped, rows are read when they are used
+        except ValueError:
+            # Pillow is only needed for images that are not plain 24-bit BMPs
+            from PIL import Image
+            image = Image.open(file_path).convert('RGB')
+            return np.array(image)
+
+    def display_image(self, image_array, label, reset_view=True):
         try:
             height, width, _ = image_array.shape
+            image_array = np.ascontiguousarray(image_array)
             qimage = QImage(image_array.data, width, height, 3 * width, QImage.Format_RGB888)
             pixmap = QPixmap.fromImage(qimage)
-            label.setPixmap(pixmap)
+            label.set_pixmap(pixmap, reset_view)
         except Exception as e:
             print(f"Error displaying image: {e}")
 
@@ -149,15 +176,10 @@ class TransmissionSimulator(QWidget):
             return
 
         try:
-                coding_type = 1 if self.coding_select.currentText() == 'Hamming' else 2
+                # 1 - Hamming, 2 - Convolutional, 3 - Hamming (packed), 4 - Reed-Solomon, 5 - Reed-Solomon + Convolutional
+                coding_type = self.coding_select.currentIndex() + 1
                 channel_model = 1 if self.channel_select.currentText() == 'BSC' else 2
 
-                original_bits = image_to_bits(self.input_image)
-                original_bit_count = original_bits.size
-                image_parts = split_image(self.input_image)
-                encoded_parts = [encode_data(image_to_bits(part), coding_type) for part in image_parts]
-                transmitted_parts = []
-
                 if channel_model == 1:  # BSC
                     try:
                         ber = float(self.param_inputs['BER'].text())
@@ -178,31 +200,56 @@ class TransmissionSimulator(QWidget):
                         print("Invalid Gilbert-Elliott parameters!")
                         return
 
-                for encoded_data in encoded_parts:
-                    if channel_model == 1:  # BSC
-                        transmitted_data, errorList = transmit_bsc(encoded_data, channel_params, coding_type,)
-                    elif channel_model == 2:  # Gilbert-Elliott
-                        transmitted_data, errorList = transmit_gilbert_elliott(encoded_data, channel_params, coding_type)
-                    else:
-                        raise ValueError("Invalid channel model selected")
-                    # print(errorList)
-                    transmitted_parts.append(transmitted_data)
-
-                noisy_non_decoded_bits = np.array(transmitted_parts).flatten()[:original_bit_count]
-                noisy_non_decoded_image = bits_to_image(noisy_non_decoded_bits, self.input_image.shape)
-                self.display_image(noisy_non_decoded_image, self.noisy_image_label)
-
-                decode_args = [
-                    (transmitted_data, coding_type, 3, part.shape)
-                    for transmitted_data, part in zip(transmitted_parts, image_parts)
-                ]
-                with mp.Pool(processes=mp.cpu_count()) as pool:
-                    decoded_parts = pool.map(decode_image_part, decode_args)
-
-                final_image = merge_image(decoded_parts)
-
-                self.display_image(final_image, self.decoded_image_label)
-                overlay_image = generate_overlay_image(self.input_image, final_image)
-                self.display_image(overlay_image, self.additional_image_label)
+                self.noisy_image = np.zeros_like(self.input_image)
+                self.decoded_image = np.zeros_like(self.input_image)
+                self.overlay_image = np.zeros_like(self.input_image)
+
+                self.task = PipelineTask(self.pipeline, self.input_image, coding_type, channel_model, channel_params,
+                                         tb_depth=3)
+                self.task.signals.progress.connect(self.update_progress)
+                self.task.signals.strip_finished.connect(self.show_strip)
+                self.task.signals.finished.connect(lambda: self.transmission_ended("Done"))
+                self.task.signals.cancelled.connect(lambda: self.transmission_ended("Cancelled"))
+                self.task.signals.failed.connect(lambda error: self.transmission_ended(f"Error: {error}"))
+                self.transmit_btn.setEnabled(False)
+                self.load_btn.setEnabled(False)
+                self.cancel_btn.setEnabled(True)
+                self.progress_bar.setValue(0)
+                QThreadPool.globalInstance().start(self.task)
         except Exception as e:
-            print(f"Error during transmission and decoding: {e}")
\ No newline at end of file
+            print(f"Error during transmission and decoding: {e}")
+
+    def update_progress(self, description, percent):
+        self.progress_label.setText(description)
+        self.progress_bar.setValue(percent)
+
+    def show_strip(self, start, stop, noisy_rows, decoded_rows):
+        """Copy the rows of a finished strip into the result images and refresh the panes."""
+        self.noisy_image[start:stop] = noisy_rows
+        self.decoded_image[start:stop] = decoded_rows
+        self.overlay_image[start:stop] = generate_overlay_image(self.input_image[start:stop], decoded_rows)
+        self.display_image(self.noisy_image, self.noisy_image_label, reset_view=False)
+        self.display_image(self.decoded_image, self.decoded_image_label, reset_view=False)
+        self.display_image(self.overlay_image, self.additional_image_label, reset_view=False)
+
+    def cancel_transmission(self):
+        if self.task is not None:
+            self.cancel_btn.setEnabled(False)
+            self.progress_label.setText("Cancelling...")
+            self.task.cancel()
+
+    def transmission_ended(self, message):
+        self.task = None
+        self.progress_label.setText(message)
+        if message == "Done":
+            self.progress_bar.setValue(100)
+        self.transmit_btn.setEnabled(True)
+        self.load_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+
+    def closeEvent(self, event):
+        if self.task is not None:
+            self.task.cancel()
+        QThreadPool.globalInstance().waitForDone()
+        self.pipeline.shutdown()
+        super().closeEvent(event)
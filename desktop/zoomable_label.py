@@ -1,21 +1,69 @@
+import math
+
 from PySide6.QtWidgets import QLabel
 from PySide6.QtGui import QPixmap, QPainter, QWheelEvent, QMouseEvent
-from PySide6.QtCore import Qt, QPoint
+from PySide6.QtCore import Qt, QPoint, QRectF, QTimer
+
+# Edge length of the tiles the mipmap levels are cut into
+TILE_SIZE = 256
+# Levels are halved until their longer side is below this size
+MIN_LEVEL_SIZE = 64
+# Milliseconds without wheel or drag events after which the view is redrawn with smooth scaling
+IDLE_DELAY = 150
+
 
 class ZoomableLabel(QLabel):
-    def __init__(self):
+    def __init__(self, tiled=True):
+        """
+        Label showing a pixmap that can be zoomed with the mouse wheel and dragged.
+
+        In tiled mode a mipmap pyramid is built once when the pixmap is set, every level cut into tiles,
+        and each paint draws only the tiles visible in the label from the level closest to the zoom:
+        with fast scaling while the view is being zoomed or dragged, smooth scaling once it is idle.
+        Otherwise the whole pixmap is rescaled on every event.
+        """
         super().__init__()
         self.setAlignment(Qt.AlignCenter)
         self._pixmap = None
         self.scale_factor = 1.0
         self.offset = QPoint(0, 0)  # Offset for dragging
         self.last_mouse_position = None
+        self.tiled = tiled
+        self.levels = []  # (horizontal scale, vertical scale, [(x, y, tile pixmap)]) from full resolution down
+        self.interacting = False
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.timeout.connect(self.end_interaction)
 
-    def set_pixmap(self, pixmap):
-        """Set the pixmap to display and reset scale."""
+    def set_pixmap(self, pixmap, reset_view=True):
+        """Set the pixmap to display and, unless reset_view is False, reset scale and offset."""
         self._pixmap = pixmap
-        self.scale_factor = 1.0
-        self.offset = QPoint(0, 0)
+        if reset_view:
+            self.scale_factor = 1.0
+            self.offset = QPoint(0, 0)
+        if self.tiled:
+            self.build_levels()
+        self.update_pixmap()
+
+    def build_levels(self):
+        """Build the mipmap pyramid of the pixmap and cut every level into tiles."""
+        self.levels = []
+        level = self._pixmap
+        while True:
+            tiles = [(x, y, level.copy(x, y, min(TILE_SIZE, level.width() - x), min(TILE_SIZE, level.height() - y)))
+                     for y in range(0, level.height(), TILE_SIZE) for x in range(0, level.width(), TILE_SIZE)]
+            self.levels.append((level.width() / self._pixmap.width(), level.height() / self._pixmap.height(), tiles))
+            if max(level.width(), level.height()) < MIN_LEVEL_SIZE:
+                break
+            level = level.scaled(max(level.width() // 2, 1), max(level.height() // 2, 1),
+                                 Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+    def start_interaction(self):
+        self.interacting = True
+        self.idle_timer.start(IDLE_DELAY)
+
+    def end_interaction(self):
+        self.interacting = False
         self.update_pixmap()
 
     def wheelEvent(self, event: QWheelEvent):
@@ -24,6 +72,7 @@ class ZoomableLabel(QLabel):
             self.scale_factor *= 1.1  # Zoom in
         else:
             self.scale_factor *= 0.9  # Zoom out
+        self.start_interaction()
         self.update_pixmap()
 
     def mousePressEvent(self, event: QMouseEvent):
@@ -37,6 +86,7 @@ class ZoomableLabel(QLabel):
             delta = event.pos() - self.last_mouse_position
             self.offset += delta
             self.last_mouse_position = event.pos()
+            self.start_interaction()
             self.update_pixmap()
 
     def mouseReleaseEvent(self, event: QMouseEvent):
@@ -46,7 +96,9 @@ class ZoomableLabel(QLabel):
 
     def update_pixmap(self):
         """Scale and update the displayed pixmap with offset."""
-        if self._pixmap:
+        if self.tiled:
+            self.update()
+        elif self._pixmap:
             scaled_pixmap = self._pixmap.scaled(self._pixmap.size() * self.scale_factor,
                                                 Qt.KeepAspectRatio, Qt.SmoothTransformation)
             result_pixmap = QPixmap(scaled_pixmap.size())
@@ -60,3 +112,26 @@ class ZoomableLabel(QLabel):
 
             self.setPixmap(result_pixmap)
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.tiled or not self.levels:
+            return
+
+        # Coarsest level that still has at least as many pixels as the screen area it is drawn on
+        index = min(max(int(math.floor(-math.log2(self.scale_factor))), 0), len(self.levels) - 1)
+        scale_x, scale_y, tiles = self.levels[index]
+        zoom_x, zoom_y = self.scale_factor / scale_x, self.scale_factor / scale_y  # level pixels -> screen pixels
+
+        width = self._pixmap.width() * self.scale_factor
+        height = self._pixmap.height() * self.scale_factor
+        left = (self.width() - width) / 2 + self.offset.x()
+        top = (self.height() - height) / 2 + self.offset.y()
+        visible = QRectF(self.rect())
+
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, not self.interacting)
+        for x, y, tile in tiles:
+            target = QRectF(left + x * zoom_x, top + y * zoom_y, tile.width() * zoom_x, tile.height() * zoom_y)
+            if target.intersects(visible):
+                painter.drawPixmap(target, tile, QRectF(tile.rect()))
+        painter.end()
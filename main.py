@@ -1,45 +1,87 @@
-from Utils.BSC import *
-from Utils.GilbertElliot import *
-from Utils.Hamming import *
-from Utils.Convolutional import *
+# Coders, channels and numpy are imported where a run selects them, so startup only pays for what is used
+import argparse
+import sys
+
+def interleave(interleaver, data):
+    return data if interleaver is None else interleaver.interleave(data).tolist()
+
+def deinterleave(interleaver, received, errors):
+    if interleaver is None:
+        return received, errors
+    return interleaver.deinterleave(received).tolist(), interleaver.deinterleave(errors).tolist()
+
+def decode_reed_solomon(codingType, received):
+    if codingType == 3:
+        from Utils.ReedSolomon import ReedSolomon
+        return ReedSolomon.DecodeData(received, True)
+    from Utils.Concatenated import ConcatenatedCoder
+    return ConcatenatedCoder.Decode(received, 10, True)
 
 def main():
 
     channelModel = int(input("Enter the channel model:      (1 - BSC, 2- Gilbert-Elliott) \n"))
-    codingType = int(input("Enter the type of coding:       (1 - Hamming, 2 - Convolutional) \n"))
+    codingType = int(input("Enter the type of coding:       (1 - Hamming, 2 - Convolutional, 3 - Reed-Solomon, "
+                           "4 - Reed-Solomon + Convolutional) \n"))
+    interleaverType = int(input("Enter the interleaver:        (0 - none, 1 - block, 2 - helical, 3 - random) \n"))
     inputData = input("Enter the input data:\n")
+    interleaver = None
+    if 1 <= interleaverType <= 3:
+        from Utils.Interleaver import Interleaver, INTERLEAVERS
+        interleaver = Interleaver(INTERLEAVERS[interleaverType - 1])
 
     if codingType == 1:
+        from Utils.Hamming import Hamming
         inputDataCoded = Hamming.CodeDataHamming(inputData)
         print(inputData)
 
     elif codingType == 2:
+        from Utils.Convolutional import ConvolutionalCoder
         inputDataCoded = ConvolutionalCoder.CodeData(inputData, False)
-        print(inputDataCoded)
+        print(inputDataCoded.tolist())
+        print(inputData)
+
+    elif codingType == 3:
+        from Utils.ReedSolomon import ReedSolomon
+        inputDataCoded = ReedSolomon.CodeData(inputData)
+        print(inputData)
+
+    elif codingType == 4:
+        from Utils.Concatenated import ConcatenatedCoder
+        inputDataCoded = ConcatenatedCoder.CodeData(inputData)
         print(inputData)
 
     else: print("Invalid input")
 
     if channelModel == 1:
+        from Utils.BSC import bsc_channel_transmission_hamming, bsc_channel_transmission_splot
         ber = float(input("Enter bit error rate: "))
 
         if codingType == 1:
-            inputDataCodedAndNoise, errorList = bsc_channel_transmission_hamming(inputDataCoded, ber)
+            inputDataCodedAndNoise, errorList = bsc_channel_transmission_hamming(interleave(interleaver, inputDataCoded), ber)
+            inputDataCodedAndNoise, errorList = deinterleave(interleaver, inputDataCodedAndNoise, errorList)
             print(inputDataCodedAndNoise)
             print(errorList)
             inputDataDecoded = Hamming.DecodeInputDataHamming(inputDataCodedAndNoise, True)
             print(inputDataDecoded)
 
         elif codingType == 2:
-            inputDataCodedAndNoise, errorList = bsc_channel_transmission_splot(inputDataCoded, ber)
+            inputDataCodedAndNoise, errorList = bsc_channel_transmission_splot(interleave(interleaver, inputDataCoded), ber)
+            inputDataCodedAndNoise, errorList = deinterleave(interleaver, inputDataCodedAndNoise, errorList)
             inputDataDecoded = ConvolutionalCoder.Decode(inputDataCodedAndNoise, 10, True, False)
             print(inputDataDecoded)
             print(errorList)
 
+        elif codingType in (3, 4):
+            inputDataCodedAndNoise, errorList = bsc_channel_transmission_splot(interleave(interleaver, inputDataCoded), ber)
+            inputDataCodedAndNoise, errorList = deinterleave(interleaver, inputDataCodedAndNoise, errorList)
+            print(decode_reed_solomon(codingType, inputDataCodedAndNoise))
+            print(errorList)
+
         else: print("Invalid input")
 
 
     elif channelModel == 2:
+        from Utils.GilbertElliot import GilbertElliottChannel
         chanceForGood = float(input("Enter the chance for good: "))
         chanceForBad = float(input("Enter the chance for bad: "))
         p_err_good = float(input("Enter the probability for good: "))
@@ -47,7 +89,8 @@ def main():
 
         if codingType == 1:
             channel = GilbertElliottChannel(chanceForBad, chanceForGood, p_err_good, p_err_bad)
-            inputDataCodedAndNoise, errorList = channel.transmitHamming(inputDataCoded)
+            inputDataCodedAndNoise, errorList = channel.transmitHamming(interleave(interleaver, inputDataCoded))
+            inputDataCodedAndNoise, errorList = deinterleave(interleaver, inputDataCodedAndNoise, errorList)
             print(inputDataCodedAndNoise)
             print(errorList)
             inputDataDecoded = Hamming.DecodeInputDataHamming(inputDataCodedAndNoise, True)
@@ -55,15 +98,78 @@ def main():
 
         elif codingType == 2:
             channel = GilbertElliottChannel(chanceForBad, chanceForGood, p_err_good, p_err_bad)
-            inputDataCodedAndNoise, errorList = channel.transmitConvolutional(inputDataCoded)
+            inputDataCodedAndNoise, errorList = channel.transmitConvolutional(interleave(interleaver, inputDataCoded))
+            inputDataCodedAndNoise, errorList = deinterleave(interleaver, inputDataCodedAndNoise, errorList)
             print(inputDataCodedAndNoise)
             print(errorList)
             inputDataDecoded = ConvolutionalCoder.Decode(inputDataCodedAndNoise, 10, True, False)
             print(inputDataDecoded)
 
+        elif codingType in (3, 4):
+            channel = GilbertElliottChannel(chanceForBad, chanceForGood, p_err_good, p_err_bad)
+            inputDataCodedAndNoise, errorList = channel.transmitConvolutional(interleave(interleaver, inputDataCoded))
+            inputDataCodedAndNoise, errorList = deinterleave(interleaver, inputDataCodedAndNoise, errorList)
+            print(errorList)
+            print(decode_reed_solomon(codingType, inputDataCodedAndNoise))
+
         else: print("Invalid input")
 
     else: print("Invalid input")
 
+def stream_main(argv):
+    """Transmit a file or stdin block by block and write the decoded bytes to a file or stdout."""
+    from Utils.Interleaver import Interleaver, INTERLEAVERS
+    from Utils.StreamPipeline import CODERS, read_blocks, make_channel, transmit_stream
+    parser = argparse.ArgumentParser(description="Send a file through an FEC coder and a noisy channel.")
+    parser.add_argument('--input', required=True, help="input file, '-' for stdin")
+    parser.add_argument('--output', required=True, help="file for the decoded bytes, '-' for stdout")
+    parser.add_argument('--coder', choices=CODERS, default='hamming')
+    parser.add_argument('--channel', choices=['bsc', 'gilbert_elliott'], default='bsc')
+    parser.add_argument('--ber', type=float, default=0.01, help="BER of the BSC")
+    parser.add_argument('--chance-for-bad', type=float, default=0.01)
+    parser.add_argument('--chance-for-good', type=float, default=0.2)
+    parser.add_argument('--p-err-good', type=float, default=0.001)
+    parser.add_argument('--p-err-bad', type=float, default=0.3)
+    parser.add_argument('--interleaver', choices=INTERLEAVERS, help="interleave every coded block")
+    parser.add_argument('--interleaver-depth', type=int, help="columns of the block/helical interleaver")
+    parser.add_argument('--block-size', type=int, default=1 << 16, help="bytes read and coded at once")
+    parser.add_argument('--tb-depth', type=int, default=10)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    if args.channel == 'bsc':
+        params = args.ber
+    else:
+        params = (args.chance_for_bad, args.chance_for_good, args.p_err_good, args.p_err_bad)
+    transmit = make_channel(args.channel, params, args.seed)
+    interleaver = Interleaver(args.interleaver, args.interleaver_depth) if args.interleaver else None
+
+    source = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    target = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    stats, last_report = None, 0.0
+    try:
+        for decoded, stats in transmit_stream(read_blocks(source, args.block_size), args.coder, transmit,
+                                              args.tb_depth, interleaver):
+            target.write(decoded)
+            if stats['seconds'] - last_report >= 1.0:
+                last_report = stats['seconds']
+                report_stream(stats, end='\r')
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if target is not sys.stdout.buffer:
+            target.close()
+    if stats is not None:
+        report_stream(stats)
+
+def report_stream(stats, end='\n'):
+    bits = stats['bytes'] * 8
+    print(f"{stats['bytes']} bytes, channel BER {stats['channel_errors'] / max(stats['coded_bits'], 1):.3e}, "
+          f"decoded BER {stats['bit_errors'] / max(bits, 1):.3e}, "
+          f"{bits / max(stats['seconds'], 1e-9) / 1e6:.2f} Mbit/s", end=end, file=sys.stderr)
+
 if __name__ == '__main__':
-    main()
+    if len(sys.argv) > 1:
+        stream_main(sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,71 @@
+import argparse
+import csv
+import sys
+
+from Utils.ResultCache import DEFAULT_CACHE_PATH, ResultCache
+from Utils.Sweep import CHANNELS, CODERS, parameter_grid, run_sweep
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo BER/FER sweep over a grid of channel parameters.")
+    parser.add_argument('--coder', choices=CODERS, default='hamming')
+    parser.add_argument('--channel', choices=list(CHANNELS), default='bsc')
+    parser.add_argument('--ber', type=float, nargs='+', help="BSC bit error rates")
+    parser.add_argument('--chance-for-bad', type=float, nargs='+', help="Gilbert-Elliott p (good -> bad)")
+    parser.add_argument('--chance-for-good', type=float, nargs='+', help="Gilbert-Elliott r (bad -> good)")
+    parser.add_argument('--p-err-good', type=float, nargs='+', help="Gilbert-Elliott error probability in good state")
+    parser.add_argument('--p-err-bad', type=float, nargs='+', help="Gilbert-Elliott error probability in bad state")
+    parser.add_argument('--ebn0-db', type=float, nargs='+', help="AWGN Eb/N0 values in dB (BPSK, soft decoding)")
+    parser.add_argument('--frame-bits', type=int, default=1960, help="message bits per frame (default: 245 chars)")
+    parser.add_argument('--frames-per-task', type=int, default=64)
+    parser.add_argument('--target-errors', type=int, default=100)
+    parser.add_argument('--rel-precision', type=float, default=0.1)
+    parser.add_argument('--max-bits', type=int, default=10 ** 8)
+    parser.add_argument('--tb-depth', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="CSV file for the results")
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_PATH, default=None,
+                        help=f"reuse and store results in a result cache (default file: {DEFAULT_CACHE_PATH})")
+    parser.add_argument('--importance-bias', type=float, default=None,
+                        help="importance sampling: multiply the BSC BER (or the Gilbert-Elliott good -> bad "
+                             "probability) by this factor and weight the errors back (for very low BER)")
+    parser.add_argument('--analytic', action='store_true',
+                        help="use exact results and tight union bounds where they exist, simulate only the rest")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    values = {name: getattr(args, name) for name in CHANNELS[args.channel] if getattr(args, name) is not None}
+    try:
+        grid = parameter_grid(args.channel, **values)
+    except ValueError as e:
+        print(f"Invalid grid: {e}")
+        sys.exit(2)
+
+    def report(result):
+        params = ", ".join(f"{name}={result[name]}" for name in CHANNELS[args.channel])
+        if result.get('method', 'simulation') != 'simulation':
+            print(f"{params}: BER={result['decoded_ber']:.3e} FER={result['decoded_fer']:.3e} ({result['method']})")
+            return
+        print(f"{params}: BER={result['decoded_ber']:.3e} [{result['decoded_ber_low']:.3e}, "
+              f"{result['decoded_ber_high']:.3e}] FER={result['decoded_fer']:.3e} "
+              f"({result['bit_errors']} errors in {result['bits']} bits, {result['wall_time']:.1f} s)")
+
+    results = run_sweep(args.coder, args.channel, grid, frame_bits=args.frame_bits,
+                        frames_per_task=args.frames_per_task, target_errors=args.target_errors,
+                        rel_precision=args.rel_precision, max_bits=args.max_bits, workers=args.workers,
+                        seed=args.seed, tb_depth=args.tb_depth, progress=report,
+                        cache=ResultCache(args.cache) if args.cache else None, analytic=args.analytic,
+                        importance_bias=args.importance_bias)
+
+    if args.output:
+        with open(args.output, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == '__main__':
+    main()